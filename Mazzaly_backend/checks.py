@@ -0,0 +1,41 @@
+"""
+System checks for settings that are fine in development but break promises in
+production (``DEBUG = False``), typically with several worker processes.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose data lives in (or never leaves) one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_default_cache(app_configs, **kwargs):
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        "The default cache is process-local, so invalidations of cached API responses, "
+        "in-memory indexes and user rows only reach the worker that made the change (the "
+        "others serve stale data until their entries expire), and login failures are counted "
+        "per worker.",
+        hint="Set CACHE_BACKEND/CACHE_LOCATION to a shared cache (Redis or Memcached).",
+        id='mazzaly.W002',
+    )]
+
+
+@register(Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('throttle', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        "The throttle cache is process-local, so every worker counts requests on its own and "
+        "rate limits are as many times looser as there are workers.",
+        hint="Set THROTTLE_CACHE_BACKEND/THROTTLE_CACHE_LOCATION to a shared cache with an atomic "
+             "increment (Redis or Memcached).",
+        id='mazzaly.W001',
+    )]
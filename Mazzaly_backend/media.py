@@ -0,0 +1,121 @@
+"""
+Serving uploaded media.
+
+``serve`` answers ``MEDIA_URL`` requests in production too (``static()`` only
+works with DEBUG on). Content-addressed files (see ``Mazzaly_backend.storage``)
+are sent with ``Cache-Control: immutable`` and their hash as ETag, so browsers
+and CDNs keep them for a year without revalidating. Files stored under their
+original names revalidate every time (``no-cache`` with Last-Modified/ETag,
+answered with 304). Single byte ranges are supported.
+
+With ``MEDIA_ACCEL_REDIRECT`` set (an internal nginx location aliasing
+MEDIA_ROOT), Django only sets the headers and hands the file to nginx with
+``X-Accel-Redirect``; nginx then streams the bytes and handles ranges itself.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import is_hashed
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, no-cache'
+CHUNK_SIZE = 64 * 1024
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _byte_range(header, size):
+    """``(start, end)`` of a single satisfiable range, None to send everything, or ``False`` if unsatisfiable."""
+    match = BYTE_RANGE.match(header.strip()) if header else None
+    if match is None:
+        # No Range, or a form we don't serve partially (e.g. several ranges)
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last or int(last) == 0:
+            return False
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+@require_safe
+def serve(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        info = os.stat(fullpath)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404
+
+    immutable = is_hashed(path)
+    if immutable:
+        etag = '"%s"' % posixpath.splitext(posixpath.basename(path))[0]
+    else:
+        etag = '"%x-%x"' % (info.st_mtime_ns, info.st_size)
+    last_modified = int(info.st_mtime)
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = _byte_range(request.headers.get('Range'), info.st_size)
+        if_range = request.headers.get('If-Range')
+        if if_range and if_range not in (etag, http_date(last_modified)):
+            # The client's partial copy is of another version
+            byte_range = None
+
+        if settings.MEDIA_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + quote(path)
+        elif byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{info.st_size}'
+        elif byte_range is None:
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read(open(fullpath, 'rb'), start, end - start + 1), status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{info.st_size}'
+            response['Content-Length'] = end - start + 1
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = IMMUTABLE if immutable else REVALIDATE
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -2,6 +2,8 @@ from pathlib import Path
 from decouple import config
 from datetime import timedelta
 
+from . import database
+
 # === Paths ===
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,15 +41,21 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'account.authentication.ClaimsJWTAuthentication',
     ),
+    # Sliding-window counters in the 'throttle' cache; a view's throttle_scope
+    # selects its rate, other views use 'anon'/'user'
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'Mazzaly_backend.throttling.ScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
         'user': '1000/day',
+        'login': '10/min',
+        'register': '10/hour',
+        'verify_email': '5/min',
+        'google_auth': '30/min',
+        'recipes': '120/min',
     },
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
 }
@@ -62,11 +70,40 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Seconds a user's token version and row are cached for ClaimsJWTAuthentication
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=60, cast=int)
+
+# ModelBackend first: email/password logins are the common case, and the
+# Google backend ignores everything but its own pipeline calls anyway
 AUTHENTICATION_BACKENDS = (
-    'social_core.backends.google.GoogleOAuth2',
     'django.contrib.auth.backends.ModelBackend',
+    'social_core.backends.google.GoogleOAuth2',
 )
 
+# === Passwords ===
+# Argon2id by default (PASSWORD_HASHER=pbkdf2 to keep Django's PBKDF2). Hashes made
+# with the other hasher or with older cost settings are upgraded on next login.
+# Defaults are OWASP's Argon2id baseline (19 MiB, 2 passes); measure alternatives
+# with `python manage.py benchmark_password_hashers`.
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='argon2')
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', default=2, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', default=19456, cast=int)  # KiB
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', default=1, cast=int)
+_HASHERS = {
+    'argon2': 'account.hashers.TunedArgon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_HASHERS[PASSWORD_HASHER]] + [h for k, h in _HASHERS.items() if k != PASSWORD_HASHER]
+
+# Failed logins allowed per email / per IP within LOGIN_FAILURE_WINDOW seconds
+LOGIN_FAILURE_LIMIT_EMAIL = config('LOGIN_FAILURE_LIMIT_EMAIL', default=5, cast=int)
+LOGIN_FAILURE_LIMIT_IP = config('LOGIN_FAILURE_LIMIT_IP', default=20, cast=int)
+LOGIN_FAILURE_WINDOW = config('LOGIN_FAILURE_WINDOW', default=900, cast=int)
+
+# Email verification codes: seconds a code is valid, wrong guesses allowed per code
+OTP_TTL = config('OTP_TTL', default=600, cast=int)
+OTP_MAX_ATTEMPTS = config('OTP_MAX_ATTEMPTS', default=5, cast=int)
+
 # === Social Auth (Google) ===
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = config('SOCIAL_AUTH_GOOGLE_OAUTH2_KEY', default='')
 SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = config('SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET', default='')
@@ -74,6 +111,19 @@ SOCIAL_AUTH_GOOGLE_OAUTH2_SCOPE = ['email', 'profile']
 SOCIAL_AUTH_GOOGLE_OAUTH2_AUTH_EXTRA_ARGUMENTS = {'access_type': 'online', 'prompt': 'select_account'}
 SOCIAL_AUTH_LOGIN_REDIRECT_URL = 'http://localhost:3000'
 SOCIAL_AUTH_LOGIN_ERROR_URL = '/swagger/'
+# Overridable so load tests can point at a local stub
+GOOGLE_USERINFO_URL = config('GOOGLE_USERINFO_URL', default='https://www.googleapis.com/oauth2/v3/userinfo')
+# Google ID tokens are verified locally; their audience must be one of these client ids
+# (comma-separated, e.g. the web, Android and iOS clients; defaults to the OAuth2 key)
+GOOGLE_CLIENT_IDS = config(
+    'GOOGLE_CLIENT_IDS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]
+) or [key for key in [SOCIAL_AUTH_GOOGLE_OAUTH2_KEY] if key]
+GOOGLE_JWKS_URL = config('GOOGLE_JWKS_URL', default='https://www.googleapis.com/oauth2/v3/certs')
+# Verified tokens -> user id, kept per process (seconds / entries)
+GOOGLE_TOKEN_CACHE_TTL = config('GOOGLE_TOKEN_CACHE_TTL', default=300, cast=int)
+GOOGLE_TOKEN_CACHE_SIZE = config('GOOGLE_TOKEN_CACHE_SIZE', default=10000, cast=int)
+# Route register/login/verify-email/google-auth to their async views (run under ASGI)
+ASYNC_ACCOUNT_VIEWS = config('ASYNC_ACCOUNT_VIEWS', default=False, cast=bool)
 SOCIAL_AUTH_PIPELINE = (
     'social_core.pipeline.social_auth.social_details',
     'social_core.pipeline.social_auth.social_uid',
@@ -121,13 +171,47 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'Mazzaly_backend.wsgi.application'
 
-# === Database (SQLite) ===
+# === Database ===
+# SQLite (WAL mode) by default; set DATABASE_URL=postgres://... in production.
+# DB_CONN_MAX_AGE keeps PostgreSQL connections open between requests, or set
+# DB_POOL_MAX_SIZE to use psycopg's connection pool instead.
 DATABASES = {
+    'default': database.from_url(
+        config('DATABASE_URL', default='sqlite:///db.sqlite3'),
+        BASE_DIR,
+        conn_max_age=config('DB_CONN_MAX_AGE', default=60, cast=int),
+        pool_min_size=config('DB_POOL_MIN_SIZE', default=0, cast=int),
+        pool_max_size=config('DB_POOL_MAX_SIZE', default=0, cast=int),
+    )
+}
+
+# === Cache ===
+# LocMem by default; point CACHE_BACKEND/CACHE_LOCATION at a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache, redis://127.0.0.1:6379)
+# so every worker sees the same cached responses and invalidations.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='mazzaly'),
+    },
+    # Rate-limit counters. Needs a backend shared by all workers (and with an
+    # atomic incr: Redis or Memcached) for limits to hold across processes.
+    'throttle': {
+        'BACKEND': config('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default='mazzaly-throttle'),
+        'KEY_PREFIX': 'throttle',
+    },
 }
+# Seconds a cached public API response (recipes, categories, meal types) is kept
+API_CACHE_TIMEOUT = config('API_CACHE_TIMEOUT', default=300, cast=int)
+# Seconds before in-memory indexes (autocomplete, pantry) are rebuilt even without
+# a change; bounds how stale they get when the default cache isn't shared
+INDEX_VERSION_TTL = config('INDEX_VERSION_TTL', default=300, cast=int)
+# Days deletions are kept for /api/sync/; clients with an older token resync everything
+SYNC_DELETION_RETENTION_DAYS = config('SYNC_DELETION_RETENTION_DAYS', default=30, cast=int)
+# Seconds a write transaction may take to commit (and app server clocks may differ)
+# without /api/sync/ missing it; rows committed later are touched again on commit
+SYNC_MAX_COMMIT_LAG = config('SYNC_MAX_COMMIT_LAG', default=30, cast=int)
 
 # === Static and Media ===
 STATIC_URL = '/static/'
@@ -136,6 +220,21 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored under the hash of their content (deduplicated, served as immutable)
+STORAGES = {
+    'default': {'BACKEND': 'Mazzaly_backend.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# Internal nginx location that aliases MEDIA_ROOT, e.g. /internal-media/ for
+#   location /internal-media/ { internal; alias /srv/mazzaly/media/; }
+# When set, media responses hand the file to nginx instead of streaming it
+MEDIA_ACCEL_REDIRECT = config('MEDIA_ACCEL_REDIRECT', default='')
+
+# Threads per web process that render recipe image variants (0: leave it all
+# to the generate_image_variants command), and their WebP quality
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
+IMAGE_WEBP_QUALITY = config('IMAGE_WEBP_QUALITY', default=80, cast=int)
+
 # .gitignore faylida **media/** ni qo‘shing!
 
 # === Default primary key field type ===
@@ -0,0 +1,48 @@
+"""
+Content-addressed media storage.
+
+Files are stored under the SHA-256 of their bytes instead of the uploaded
+filename: ``recipes/photo.JPG`` is saved as ``recipes/3f/3fa9...c1.jpg``. The
+same bytes always get the same name, so an identical upload reuses the stored
+file instead of writing a copy. A name also never points at different bytes,
+which is what lets ``Mazzaly_backend.media`` serve such files as immutable.
+
+Because a file may be shared by several rows, code that replaces a file must
+not delete the old one when ``storage.deduplicates`` is set.
+"""
+import hashlib
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+CHUNK_SIZE = 64 * 1024
+# <upload_to>/<first two hex digits>/<64 hex digits><.ext>
+HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[a-z0-9]+)?$')
+
+
+def is_hashed(name):
+    return HASHED_NAME.search(name) is not None
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    deduplicates = True
+
+    def hashed_name(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
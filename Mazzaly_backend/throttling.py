@@ -0,0 +1,98 @@
+"""
+API rate limiting.
+
+DRF's throttles keep a list with a timestamp of every request in the window, so
+each check reads and rewrites a list that grows with the rate (a '1000/day'
+user carries up to 1000 floats). ``SlidingWindowRateThrottle`` keeps two
+integer counters per client instead, the current and the previous fixed window,
+and estimates the requests in the last ``duration`` seconds as
+
+    previous * (share of the previous window still inside the last duration) + current
+
+Each check is one ``get_many`` and, when allowed, one ``add``/``incr``, however
+many requests the client has made. Counters live in the ``throttle`` cache;
+with a shared backend (Redis, Memcached) every worker enforces the same limits.
+
+``ScopedRateThrottle`` is the only throttle in ``DEFAULT_THROTTLE_CLASSES``: a
+view's ``throttle_scope`` picks its rate from ``DEFAULT_THROTTLE_RATES``, views
+without one fall under 'user' or 'anon'.
+"""
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    cache = ConnectionProxy(caches, 'throttle')
+
+    @property
+    def THROTTLE_RATES(self):
+        # Read per instance so changed settings (and override_settings) apply
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, self.elapsed = divmod(self.now, self.duration)
+        self.current_key = f'{self.key}:{int(window)}'
+        previous_key = f'{self.key}:{int(window) - 1}'
+        counts = self.cache.get_many([self.current_key, previous_key])
+        self.current = counts.get(self.current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+
+        if self.estimate() >= self.num_requests:
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def estimate(self):
+        return self.previous * (1 - self.elapsed / self.duration) + self.current
+
+    def throttle_success(self):
+        # The counter outlives its own window so the next one can read it as "previous"
+        timeout = 2 * self.duration
+        self.cache.add(self.current_key, 0, timeout)
+        try:
+            self.cache.incr(self.current_key)
+        except ValueError:
+            # expired between add() and incr()
+            self.cache.set(self.current_key, 1, timeout)
+        return True
+
+    def wait(self):
+        """Seconds until the estimate drops below the limit again."""
+        if self.current < self.num_requests:
+            # Only the previous window's share is still decaying within this window
+            remaining = self.duration - self.elapsed
+            return max(remaining - self.duration * (self.num_requests - self.current) / self.previous, 0)
+        # Full already: wait for this window to end and its count to decay in the next
+        return self.duration - self.elapsed + self.duration * (1 - self.num_requests / self.current)
+
+
+class ScopedRateThrottle(SlidingWindowRateThrottle):
+    """
+    Limits each view by its ``throttle_scope`` (default 'user' for authenticated
+    requests, 'anon' otherwise). Authenticated requests are counted per user,
+    anonymous ones per client IP.
+    """
+
+    def __init__(self):
+        # The rate depends on the view; it is set in allow_request()
+        pass
+
+    def allow_request(self, request, view):
+        self.authenticated = bool(request.user and request.user.is_authenticated)
+        self.scope = getattr(view, 'throttle_scope', None) or ('user' if self.authenticated else 'anon')
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        ident = request.user.pk if self.authenticated else self.get_ident(request)
+        return f'{self.scope}:{ident}'
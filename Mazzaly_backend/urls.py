@@ -30,7 +30,11 @@ urlpatterns = [
     path('social/', include('social_django.urls', namespace='social')),  # Google Auth
 ]
 
-# Media uchun:
+# Media uchun (DEBUG o'chiq bo'lsa ham; see Mazzaly_backend.media):
+import re
 from django.conf import settings
-from django.conf.urls.static import static
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+from django.urls import re_path
+from . import media
+urlpatterns += [
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media.serve, name='media'),
+]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import User, OutboundEmail
 from django.contrib.sites.models import Site
 
 class UserAdmin(BaseUserAdmin):
@@ -21,3 +21,10 @@ class UserAdmin(BaseUserAdmin):
 
 admin.site.unregister(Site)
 admin.site.register(User, UserAdmin)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
@@ -0,0 +1,127 @@
+"""
+Stateless JWT authentication.
+
+Tokens issued by ``ClaimsRefreshToken`` carry the user's id, the
+``User.CLAIM_FIELDS`` and ``token_version``. ``ClaimsJWTAuthentication`` builds
+``request.user`` from those claims without querying the user table: the
+instance is a real User with its other fields deferred, so it can be assigned to
+foreign keys and used in filters as-is. The first access to a field the token
+doesn't carry loads the rest of the row, through a short-lived cache.
+
+Revocation: ``User.save()`` bumps ``token_version`` when the password or a
+claim field changes, and a token whose version is no longer current is
+rejected. The current version is read from the cache (refreshed on save,
+dropped on delete) so checking it costs no query either.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+VERSION_CLAIM = 'ver'
+# Not cached with the rest of the row; loaded from the database when needed
+UNCACHED_FIELDS = ('password',)
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in User.CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+
+def _version_key(user_id):
+    return f'account:token-version:{user_id}'
+
+
+def _row_key(user_id, version):
+    return f'account:user:{user_id}:{version}'
+
+
+def current_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+        if version is not None:
+            cache.set(_version_key(user_id), version, settings.JWT_USER_CACHE_TTL)
+    return version
+
+
+def user_changed(user):
+    """Publish ``user``'s token version and drop its cached row (called on save)."""
+    def refresh():
+        cache.set(_version_key(user.pk), user.token_version, settings.JWT_USER_CACHE_TTL)
+        cache.delete(_row_key(user.pk, user.token_version))
+
+    refresh()
+    # Again on commit, in case a request re-cached the old row in between
+    transaction.on_commit(refresh)
+
+
+def user_deleted(user):
+    """Forget ``user``'s cached version and row, so its tokens fail once the row is gone (called on delete)."""
+    # The collector clears instance.pk after the delete, before on_commit runs
+    keys = [_version_key(user.pk), _row_key(user.pk, user.token_version)]
+
+    def forget():
+        cache.delete_many(keys)
+
+    forget()
+    transaction.on_commit(forget)
+
+
+def user_from_claims(token):
+    values = {
+        'id': token[api_settings.USER_ID_CLAIM],
+        'token_version': token[VERSION_CLAIM],
+        **{field: token[field] for field in User.CLAIM_FIELDS},
+    }
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    user = User.from_db('default', fields, [values[f] for f in fields])
+    user._from_claims = True
+    return user
+
+
+def load_remaining_fields(user):
+    """Fill in the deferred fields of a user built from claims."""
+    key = _row_key(user.pk, user.token_version)
+    row = cache.get(key)
+    if row is None:
+        names = [f.attname for f in User._meta.concrete_fields if f.attname not in UNCACHED_FIELDS]
+        row = User.objects.filter(pk=user.pk).values(*names).first()
+        if row is None:
+            raise User.DoesNotExist
+        cache.set(key, row, settings.JWT_USER_CACHE_TTL)
+    for name in user.get_deferred_fields() & row.keys():
+        user.__dict__[name] = row[name]
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts the token's claims instead of loading the user."""
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            # Issued before claims were added
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        version = current_version(user_id)
+        if version is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if version != validated_token[VERSION_CLAIM]:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        if not validated_token.get('is_active', False):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user_from_claims(validated_token)
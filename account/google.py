@@ -0,0 +1,190 @@
+"""
+Google sign-in with a token from a client app.
+
+``authenticate``/``aauthenticate`` take an OAuth access token and do what
+``GoogleOAuth2.do_auth`` does: fetch the token's userinfo from Google, then run
+the social-auth pipeline to find or create the User. The async variant makes
+the HTTP call with httpx so the event loop keeps serving other requests while
+Google answers.
+
+``authenticate_id_token`` takes a Google ID token (a signed JWT) instead and
+verifies it locally against Google's public keys, which are fetched once and
+cached, so no request to Google is made per login.
+
+Either way, the user a token resolved to is remembered in a small in-process
+LRU keyed by the token's hash, so a client that sends the same token again
+costs no outbound call and no pipeline run until the entry expires
+(``GOOGLE_TOKEN_CACHE_TTL``, or the token's own expiry if sooner).
+"""
+import functools
+import hashlib
+import ssl
+import threading
+import time
+from collections import OrderedDict
+
+import certifi
+import httpx
+import jwt
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from social_django.utils import load_strategy
+
+from .models import User
+
+BACKEND = 'google-oauth2'
+TIMEOUT = 10
+ID_TOKEN_ISSUERS = ('https://accounts.google.com', 'accounts.google.com')
+# Google rotates signing keys every few weeks; unknown key ids trigger a refetch
+JWKS_LIFESPAN = 6 * 60 * 60
+
+
+class TokenCache:
+    """Thread-safe LRU of token hash -> (user id, expiry); tokens themselves are not kept."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def set(self, token, user_id, ttl):
+        if ttl <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(settings.GOOGLE_TOKEN_CACHE_SIZE)
+
+
+def _remember(token, user, expires_at=None):
+    if user is None or not user.is_active:
+        return
+    ttl = settings.GOOGLE_TOKEN_CACHE_TTL
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - time.time())
+    token_cache.set(token, user.pk, ttl)
+
+
+def _cached_user(token):
+    user_id = token_cache.get(token)
+    if user_id is None:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+async def _acached_user(token):
+    user_id = token_cache.get(token)
+    if user_id is None:
+        return None
+    return await User.objects.filter(pk=user_id, is_active=True).afirst()
+
+
+def load_backend(request):
+    return load_strategy(request).get_backend(BACKEND, redirect_uri=None)
+
+
+def _headers(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def userinfo(backend, token):
+    return backend.get_json(settings.GOOGLE_USERINFO_URL, headers=_headers(token), timeout=TIMEOUT)
+
+
+@functools.cache
+def _ssl_context():
+    # Loading the CA bundle takes ~0.2 s of CPU; doing it per request would stall the event loop
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+async def auserinfo(token):
+    async with httpx.AsyncClient(timeout=TIMEOUT, verify=_ssl_context()) as client:
+        response = await client.get(settings.GOOGLE_USERINFO_URL, headers=_headers(token))
+        response.raise_for_status()
+        return response.json()
+
+
+def complete(backend, data, token=None):
+    """Run the pipeline for already fetched userinfo (or ID token claims) ``data``."""
+    response = {**data, 'access_token': token} if token else dict(data)
+    return backend.strategy.authenticate(backend=backend, response=response)
+
+
+def authenticate(request, token):
+    user = _cached_user(token)
+    if user is None:
+        backend = load_backend(request)
+        user = complete(backend, userinfo(backend, token), token)
+        _remember(token, user)
+    return user
+
+
+async def aauthenticate(request, token):
+    user = await _acached_user(token)
+    if user is None:
+        backend = load_backend(request)
+        data = await auserinfo(token)
+        user = await sync_to_async(complete)(backend, data, token)
+        _remember(token, user)
+    return user
+
+
+@functools.cache
+def _jwks_client():
+    return jwt.PyJWKClient(
+        settings.GOOGLE_JWKS_URL, cache_keys=True, lifespan=JWKS_LIFESPAN,
+        timeout=TIMEOUT, ssl_context=_ssl_context(),
+    )
+
+
+def verify_id_token(id_token):
+    """Return the claims of a valid Google ID token issued to one of our client ids."""
+    if not settings.GOOGLE_CLIENT_IDS:
+        raise ValueError('Google ID tokens are not accepted: GOOGLE_CLIENT_IDS is not configured')
+    signing_key = _jwks_client().get_signing_key_from_jwt(id_token)
+    claims = jwt.decode(
+        id_token, signing_key.key, algorithms=['RS256'],
+        audience=settings.GOOGLE_CLIENT_IDS, issuer=ID_TOKEN_ISSUERS,
+        options={'require': ['exp', 'iat', 'iss', 'aud', 'sub']},
+    )
+    if not claims.get('email_verified'):
+        raise ValueError('Google account email is not verified')
+    return claims
+
+
+def authenticate_id_token(request, id_token):
+    user = _cached_user(id_token)
+    if user is None:
+        claims = verify_id_token(id_token)
+        user = complete(load_backend(request), claims)
+        _remember(id_token, user, expires_at=claims['exp'])
+    return user
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from account.views import AsyncGoogleAuthView, GoogleAuthView
+
+EMAIL = 'benchmark-google@example.com'
+
+
+def stub_server(latency):
+    """A local stand-in for Google's userinfo endpoint that answers after ``latency`` seconds."""
+    body = json.dumps({'sub': 'benchmark', 'email': EMAIL, 'given_name': 'Bench', 'family_name': 'Mark'}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second of the sync and async Google auth views in one worker, "
+        "against a local stub of Google's userinfo endpoint with a fixed latency. The sync view "
+        "handles one request at a time (as a sync worker does); the async view gets --concurrency "
+        "requests at once on one event loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--latency', type=float, default=0.05, help="Stub response time in seconds")
+
+    def handle(self, *args, **options):
+        server = stub_server(options['latency'])
+        url = f'http://127.0.0.1:{server.server_port}/userinfo'
+        try:
+            with override_settings(GOOGLE_USERINFO_URL=url, ALLOWED_HOSTS=['testserver']):
+                sync_rps = self.run_sync(options['requests'])
+                async_rps = asyncio.run(self.run_async(options['requests'], options['concurrency']))
+        finally:
+            server.shutdown()
+            get_user_model().objects.filter(email=EMAIL).delete()
+
+        self.stdout.write(f"stub latency {options['latency'] * 1000:.0f} ms, {options['requests']} requests")
+        self.stdout.write(f"sync view:  {sync_rps:8.1f} req/s")
+        self.stdout.write(f"async view: {async_rps:8.1f} req/s ({options['concurrency']} in flight)")
+
+    def request(self, factory):
+        request = factory.post('/api/google-auth/', {'access_token': 'benchmark'}, content_type='application/json')
+        request.session = SessionStore()
+        return request
+
+    def ensure_ok(self, response):
+        if response.status_code != 200:
+            raise RuntimeError(f"Google auth failed: {response.data}")
+
+    def run_sync(self, count):
+        view = GoogleAuthView.as_view(throttle_classes=[])
+        factory = RequestFactory()
+        start = time.perf_counter()
+        for _ in range(count):
+            self.ensure_ok(view(self.request(factory)))
+        return count / (time.perf_counter() - start)
+
+    async def run_async(self, count, concurrency):
+        view = AsyncGoogleAuthView.as_view(throttle_classes=[])
+        factory = AsyncRequestFactory()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with slots:
+                self.ensure_ok(await view(self.request(factory)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(count)))
+        return count / (time.perf_counter() - start)
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher
+from django.core.management.base import BaseCommand
+
+from account.hashers import TunedArgon2PasswordHasher
+
+# (time_cost, memory_cost KiB, parallelism)
+ARGON2_CANDIDATES = [(1, 47104, 1), (2, 19456, 1), (3, 12288, 1), (2, 65536, 1), (2, 102400, 8)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time one password hash (= one login) for the configured hasher, Django's PBKDF2 "
+        "and a few Argon2id parameter sets, to pick ARGON2_* settings for this hardware."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        configured = get_hasher()
+        self.report(f"configured ({configured.algorithm})", configured, options['repeat'])
+        self.report(f"pbkdf2_sha256 ({PBKDF2PasswordHasher.iterations} iterations)",
+                    PBKDF2PasswordHasher(), options['repeat'])
+        for time_cost, memory_cost, parallelism in ARGON2_CANDIDATES:
+            hasher = type('Candidate', (TunedArgon2PasswordHasher,), {
+                'time_cost': time_cost, 'memory_cost': memory_cost, 'parallelism': parallelism,
+            })()
+            self.report(f"argon2id t={time_cost} m={memory_cost} p={parallelism}", hasher, options['repeat'])
+        self.stdout.write(
+            f"current: ARGON2_TIME_COST={settings.ARGON2_TIME_COST} "
+            f"ARGON2_MEMORY_COST={settings.ARGON2_MEMORY_COST} ARGON2_PARALLELISM={settings.ARGON2_PARALLELISM}"
+        )
+
+    def report(self, label, hasher, repeat):
+        salt = hasher.salt()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            hasher.encode('benchmark-Password1', salt)
+        self.stdout.write(f"{label:40} {(time.perf_counter() - start) / repeat * 1000:8.1f} ms")
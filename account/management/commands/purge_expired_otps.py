@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from account import otp
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired email verification codes in batches. "
+        "Run periodically (e.g. hourly from cron) to keep the table small."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=otp.PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = otp.purge_expired(options['batch_size'])
+        if options['verbosity']:
+            self.stdout.write(f"{deleted} expired codes deleted")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued emails (verification codes etc.). Runs once by default, "
+        "e.g. from cron; use --loop to keep polling as a worker process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running and poll for new mail")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls when idle")
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = outbox.deliver(options['batch_size'])
+            if (sent or failed) and options['verbosity']:
+                self.stdout.write(f"{sent} sent, {failed} failed")
+            if not options['loop']:
+                break
+            # Drain a backlog without pausing; sleep only when the queue is idle
+            if sent + failed < options['batch_size']:
+                time.sleep(options['interval'])
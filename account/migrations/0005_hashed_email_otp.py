@@ -0,0 +1,54 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def delete_plaintext_codes(apps, schema_editor):
+    # Pending codes can't be hashed without keeping them readable; unverified
+    # users get a new code the next time they log in
+    apps.get_model('account', 'EmailOTP').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_plaintext_codes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='emailotp',
+            name='code',
+        ),
+        migrations.AddField(
+            model_name='emailotp',
+            name='email',
+            field=models.EmailField(default='', max_length=254),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='emailotp',
+            name='code_hash',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='emailotp',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='emailotp',
+            name='expires_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(fields=['email', 'code_hash'], name='email_otp_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(fields=['expires_at'], name='email_otp_expiry_idx'),
+        ),
+    ]
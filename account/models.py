@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
+from django.utils import timezone
 
 class UserManager(BaseUserManager):
     def create_user(self, email, first_name, last_name, password=None):
@@ -25,20 +26,96 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_email_verified = models.BooleanField(default=False)
+    # Bumped on password/status changes; tokens carrying an older value are rejected
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
 
+    # Fields copied into JWTs (see account.authentication); changing one revokes tokens
+    CLAIM_FIELDS = ('email', 'is_active', 'is_staff', 'is_email_verified')
+
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_claims = {f: instance.__dict__[f] for f in cls.CLAIM_FIELDS if f in instance.__dict__}
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_claims', None)
+        # _password is only set by set_password(), not by a rehash on login
+        if not self._state.adding and (self._password is not None or (
+            loaded is not None and any(self.__dict__.get(f, v) != v for f, v in loaded.items())
+        )):
+            self.token_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'token_version'}
+        super().save(*args, **kwargs)
+        self._loaded_claims = {f: self.__dict__[f] for f in self.CLAIM_FIELDS if f in self.__dict__}
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # A user built from token claims loads all its remaining fields on first
+        # access to one of them, from the user cache when possible
+        if fields is not None and self.__dict__.pop('_from_claims', False):
+            from .authentication import load_remaining_fields
+
+            load_remaining_fields(self)
+            if not set(fields) & self.get_deferred_fields():
+                return
+        super().refresh_from_db(using, fields, from_queryset)
+
 
 class EmailOTP(models.Model):
+    """A pending email verification code; only its HMAC is stored (see account.otp)."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='email_otp')
-    code = models.CharField(max_length=6)
+    email = models.EmailField()
+    code_hash = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # verification looks the code up by both; wrong codes are counted by email
+            models.Index(fields=['email', 'code_hash'], name='email_otp_lookup_idx'),
+            # purge_expired_otps
+            models.Index(fields=['expires_at'], name='email_otp_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"OTP for {self.email}"
+
+
+class OutboundEmail(models.Model):
+    """A queued email; delivered by the ``send_queued_email`` command (see account.outbox)."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    # Body holds a secret (e.g. a verification code): cleared once the message is sent or given up on
+    sensitive = models.BooleanField(default=False)
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's "due" scan
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
 
     def __str__(self):
-        return f"OTP for {self.user.email}"
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
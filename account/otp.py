@@ -0,0 +1,90 @@
+"""
+Email verification codes.
+
+A code is six random digits, valid for ``OTP_TTL`` seconds. Only an HMAC of it
+(keyed with SECRET_KEY and bound to the email) is stored, so the table holds no
+usable codes, and ``verify()`` finds the matching row with one indexed lookup
+on ``(email, code_hash)`` that checks expiry and attempts in the same query.
+Wrong codes count against the email's pending OTP; after ``OTP_MAX_ATTEMPTS``
+it no longer matches and a new code has to be sent. ``purge_expired()`` (the
+``purge_expired_otps`` command) deletes expired rows in batches.
+"""
+import secrets
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .models import EmailOTP
+
+PURGE_BATCH_SIZE = 1000
+
+
+def hash_code(email, code):
+    return salted_hmac('account.otp', f'{email}:{code}', algorithm='sha256').hexdigest()
+
+
+def issue(user):
+    """Create or replace ``user``'s pending OTP and return the plaintext code."""
+    code = f'{secrets.randbelow(10 ** 6):06d}'
+    EmailOTP.objects.update_or_create(user=user, defaults={
+        'email': user.email,
+        'code_hash': hash_code(user.email, code),
+        'attempts': 0,
+        'expires_at': timezone.now() + timedelta(seconds=settings.OTP_TTL),
+    })
+    return code
+
+
+def _pending(email):
+    return EmailOTP.objects.filter(email=email, expires_at__gt=timezone.now())
+
+
+def _matching(email, code):
+    return _pending(email).filter(
+        code_hash=hash_code(email, code), attempts__lt=settings.OTP_MAX_ATTEMPTS,
+    ).select_related('user')
+
+
+def _consume(otp):
+    user = otp.user
+    with transaction.atomic():
+        user.is_email_verified = True
+        user.save(update_fields=['is_email_verified'])
+        otp.delete()
+    return user
+
+
+def verify(email, code):
+    """Mark the email verified and return its user, or None (counting the attempt)."""
+    otp = _matching(email, code).first()
+    if otp is None:
+        _pending(email).update(attempts=F('attempts') + 1)
+        return None
+    return _consume(otp)
+
+
+async def averify(email, code):
+    otp = await _matching(email, code).afirst()
+    if otp is None:
+        await _pending(email).aupdate(attempts=F('attempts') + 1)
+        return None
+    return await sync_to_async(_consume)(otp)
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE):
+    """Delete expired OTPs ``batch_size`` rows at a time; returns how many were deleted."""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        # Short transactions: each batch is one indexed range read and a delete by pk
+        batch = list(EmailOTP.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += EmailOTP.objects.filter(pk__in=batch).delete()[0]
+        if len(batch) < batch_size:
+            return deleted
@@ -0,0 +1,103 @@
+"""
+Database-backed email outbox.
+
+Views call ``enqueue()``, which only inserts an OutboundEmail row (in the same
+transaction as the data the mail is about), so a request never waits on SMTP.
+The ``send_queued_email`` command calls ``deliver()``: due messages are sent
+in batches over one mail-server connection, and failures are retried with
+exponential backoff until ``MAX_ATTEMPTS`` is reached. The body of a message
+enqueued with ``sensitive=True`` is cleared as soon as it is sent or has failed
+for good, so secrets in it don't outlive the delivery.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+RETRY_BASE = timedelta(seconds=30)
+RETRY_MAX = timedelta(hours=1)
+
+
+def enqueue(subject, body, recipients, from_email=None, sensitive=False):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        sensitive=sensitive,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff after ``attempts`` failed attempts: 30 s, 1 min, 2 min, ... up to an hour."""
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def _claim(batch_size):
+    # skip_locked lets several workers run side by side on PostgreSQL;
+    # SQLite has no row locks and serializes the transaction instead
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.PENDING, next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        # Push the claimed rows out of the due window while they are being sent
+        OutboundEmail.objects.filter(pk__in=[m.pk for m in batch]).update(
+            next_attempt_at=timezone.now() + RETRY_MAX
+        )
+    return batch
+
+
+def deliver(batch_size=BATCH_SIZE, connection=None):
+    """Send one batch of due messages; returns ``(sent, failed)``."""
+    batch = _claim(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent, failed = [], []
+    try:
+        connection.open()
+    except Exception as e:
+        failed = [(message, e) for message in batch]
+    else:
+        try:
+            for message in batch:
+                try:
+                    connection.send_messages([EmailMessage(
+                        message.subject, message.body, message.from_email or None,
+                        message.recipients, connection=connection,
+                    )])
+                except Exception as e:
+                    failed.append((message, e))
+                else:
+                    sent.append(message)
+        finally:
+            connection.close()
+
+    now = timezone.now()
+    for message in sent:
+        message.status, message.sent_at, message.last_error = OutboundEmail.SENT, now, ''
+        message.attempts += 1
+    for message, error in failed:
+        message.attempts += 1
+        message.last_error = f'{type(error).__name__}: {error}'
+        if message.attempts >= MAX_ATTEMPTS:
+            message.status = OutboundEmail.FAILED
+        else:
+            message.next_attempt_at = now + retry_delay(message.attempts)
+    for message in sent + [m for m, _ in failed]:
+        if message.sensitive and message.status != OutboundEmail.PENDING:
+            message.body = ''
+    OutboundEmail.objects.bulk_update(
+        sent + [m for m, _ in failed],
+        ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'body'],
+    )
+    return len(sent), len(failed)
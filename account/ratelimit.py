@@ -0,0 +1,60 @@
+"""
+Failed-login limiter.
+
+Failures are counted per email and per client IP in fixed windows of
+``LOGIN_FAILURE_WINDOW`` seconds in the default cache. Once either count
+reaches its limit, further attempts are rejected before the password is
+hashed, until the window ends.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+def _window():
+    return int(time.time() // settings.LOGIN_FAILURE_WINDOW)
+
+
+def _email_key(email):
+    digest = hashlib.sha256((email or '').strip().lower().encode()).hexdigest()
+    return f'login-failures:email:{digest}:{_window()}'
+
+
+def _keys(email, ip):
+    return (
+        (_email_key(email), settings.LOGIN_FAILURE_LIMIT_EMAIL),
+        (f'login-failures:ip:{ip}:{_window()}', settings.LOGIN_FAILURE_LIMIT_IP),
+    )
+
+
+def client_ip(request):
+    # Same client identification as DRF's throttles (honours NUM_PROXIES)
+    return BaseThrottle().get_ident(request)
+
+
+def retry_after(email, ip):
+    """Seconds until ``email``/``ip`` may try again, or 0 if not blocked."""
+    keys = _keys(email, ip)
+    counts = cache.get_many([key for key, _ in keys])
+    if any(counts.get(key, 0) >= limit for key, limit in keys):
+        window = settings.LOGIN_FAILURE_WINDOW
+        return int(window - time.time() % window) + 1
+    return 0
+
+
+def record_failure(email, ip):
+    for key, _ in _keys(email, ip):
+        # add() starts the counter with the window's expiry, incr() keeps it
+        cache.add(key, 0, settings.LOGIN_FAILURE_WINDOW)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # expired between add() and incr()
+            cache.set(key, 1, settings.LOGIN_FAILURE_WINDOW)
+
+
+def reset(email):
+    cache.delete(_email_key(email))
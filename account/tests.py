@@ -1,3 +1,436 @@
-from django.test import TestCase
+import re
+import time
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from asgiref.sync import sync_to_async
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core import mail
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import google, otp, outbox
+from .models import EmailOTP, OutboundEmail, User
+from .views import AsyncGoogleAuthView, AsyncLoginView, AsyncRegisterView, AsyncVerifyEmailView
+
+REGISTER = {'email': 'new@example.com', 'first_name': 'New', 'last_name': 'Cook', 'password': 'Secret123'}
+
+
+def sent_code(body):
+    return re.search(r'\b\d{6}\b', body).group()
+
+
+class FlakyBackend(EmailBackend):
+    """Fails for recipients listed in ``fail_for``."""
+    fail_for = set()
+
+    def send_messages(self, messages):
+        if any(set(m.to) & self.fail_for for m in messages):
+            raise SMTPException('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        self.opened += 1
+        return super().open()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_register_queues_mail_without_sending(self):
+        response = self.client.post(reverse('register'), REGISTER)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.recipients, ['new@example.com'])
+
+        call_command('send_queued_email', verbosity=0)
+        self.assertEqual(len(mail.outbox), 1)
+        code = sent_code(mail.outbox[0].body)
+        self.assertEqual(User.objects.get().email_otp.code_hash, otp.hash_code(REGISTER['email'], code))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (OutboundEmail.SENT, 1))
+        # Only the hash is left in the database
+        self.assertFalse(OutboundEmail.objects.filter(body__contains=code).exists())
+
+    def test_batch_reuses_one_connection(self):
+        for i in range(3):
+            outbox.enqueue('Hi', 'Body', [f'user{i}@example.com'])
+        connection = CountingBackend()
+        self.assertEqual(outbox.deliver(connection=connection), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(connection.opened, 1)
+
+    @override_settings(EMAIL_BACKEND='account.tests.FlakyBackend')
+    def test_failures_back_off_and_give_up(self):
+        FlakyBackend.fail_for = {'bad@example.com'}
+        bad = outbox.enqueue('Hi', 'Body', ['bad@example.com'])
+        outbox.enqueue('Hi', 'Body', ['good@example.com'])
+        self.assertEqual(outbox.deliver(), (1, 1))
+
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (OutboundEmail.PENDING, 1))
+        self.assertIn('mailbox unavailable', bad.last_error)
+        self.assertGreater(bad.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        # not due yet
+        self.assertEqual(outbox.deliver(), (0, 0))
+
+        for attempt in range(2, outbox.MAX_ATTEMPTS + 1):
+            OutboundEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(outbox.deliver(), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (OutboundEmail.FAILED, outbox.MAX_ATTEMPTS))
+
+
+GOOGLE_USER = {'sub': '1234', 'email': 'g@example.com', 'given_name': 'Gee', 'family_name': 'Mail'}
+
+
+class GoogleAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        google.token_cache.clear()
+
+    def test_sync_view_runs_pipeline(self):
+        with mock.patch('account.google.userinfo', return_value=GOOGLE_USER) as fetch:
+            response = APIClient().post(reverse('google-auth'), {'access_token': 'tok'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['user']['email'], 'g@example.com')
+        self.assertEqual(fetch.call_args.args[1], 'tok')
+        self.assertEqual(User.objects.get().first_name, 'Gee')
+
+    def test_repeat_token_skips_google(self):
+        client = APIClient()
+        with mock.patch('account.google.userinfo', return_value=GOOGLE_USER) as fetch:
+            first = client.post(reverse('google-auth'), {'access_token': 'tok'})
+            second = client.post(reverse('google-auth'), {'access_token': 'tok'})
+            client.post(reverse('google-auth'), {'access_token': 'other'})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.data['user'], second.data['user'])
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_deactivated_user_is_not_served_from_cache(self):
+        with mock.patch('account.google.userinfo', return_value=GOOGLE_USER) as fetch:
+            APIClient().post(reverse('google-auth'), {'access_token': 'tok'})
+            User.objects.update(is_active=False)
+            response = APIClient().post(reverse('google-auth'), {'access_token': 'tok'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_rejected_token(self):
+        with mock.patch('account.google.userinfo', side_effect=ValueError('401 Unauthorized')):
+            response = APIClient().post(reverse('google-auth'), {'access_token': 'bad'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('401', response.data['error'])
+
+
+class AsyncAccountViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        google.token_cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    async def call(self, view, data):
+        request = self.factory.post('/api/', data, content_type='application/json')
+        request.session = SessionStore()
+        response = await view.as_view()(request)
+        return response
+
+    async def test_register_verify_login(self):
+        response = await self.call(AsyncRegisterView, REGISTER)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(await OutboundEmail.objects.acount(), 1)
+
+        credentials = {'email': REGISTER['email'], 'password': REGISTER['password']}
+        response = await self.call(AsyncLoginView, credentials)
+        self.assertEqual(response.status_code, 400)
+
+        # the login above sent a new code
+        code = sent_code((await OutboundEmail.objects.alatest('id')).body)
+        response = await self.call(AsyncVerifyEmailView, {'email': REGISTER['email'], 'code': '00000'})
+        self.assertEqual(response.status_code, 400)
+        response = await self.call(AsyncVerifyEmailView, {'email': REGISTER['email'], 'code': code})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.data)
+
+        response = await self.call(AsyncLoginView, credentials)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['email'], REGISTER['email'])
+
+    async def test_register_validation_errors(self):
+        await sync_to_async(User.objects.create_user)(REGISTER['email'], 'A', 'B', 'Secret123')
+        response = await self.call(AsyncRegisterView, {**REGISTER, 'password': 'short'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'email', 'password'})
+
+    async def test_google_auth(self):
+        async def fake_userinfo(token):
+            return GOOGLE_USER
+
+        with mock.patch('account.google.auserinfo', fake_userinfo):
+            response = await self.call(AsyncGoogleAuthView, {'access_token': 'tok'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['user']['email'], 'g@example.com')
+        response = await self.call(AsyncGoogleAuthView, {})
+        self.assertEqual(response.status_code, 400)
+
+
+class TokenCacheTests(TestCase):
+    def test_lru_eviction_and_expiry(self):
+        tokens = google.TokenCache(maxsize=2)
+        tokens.set('a', 1, 60)
+        tokens.set('b', 2, 60)
+        self.assertEqual(tokens.get('a'), 1)   # a is now most recently used
+        tokens.set('c', 3, 60)
+        self.assertEqual((tokens.get('a'), tokens.get('b'), tokens.get('c')), (1, None, 3))
+
+        tokens.set('d', 4, 0.01)
+        tokens.set('e', 5, 0)                  # already expired: not stored
+        time.sleep(0.02)
+        self.assertEqual((tokens.get('d'), tokens.get('e')), (None, None))
+
+
+@override_settings(GOOGLE_CLIENT_IDS=['client-1.apps.googleusercontent.com'])
+class GoogleIdTokenTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = jwt.algorithms.RSAAlgorithm.to_jwk(cls.private_key.public_key(), as_dict=True)
+        cls.jwks = {'keys': [{**jwk, 'kid': 'key-1', 'use': 'sig', 'alg': 'RS256'}]}
+
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        google.token_cache.clear()
+        google._jwks_client.cache_clear()
+        patcher = mock.patch.object(jwt.PyJWKClient, 'fetch_data', return_value=self.jwks)
+        self.fetch_keys = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def id_token(self, **claims):
+        now = int(time.time())
+        claims = {
+            'iss': 'https://accounts.google.com', 'aud': 'client-1.apps.googleusercontent.com',
+            'iat': now, 'exp': now + 3600, 'email_verified': True, **GOOGLE_USER, **claims,
+        }
+        return jwt.encode(claims, self.private_key, algorithm='RS256', headers={'kid': 'key-1'})
+
+    def post(self, token):
+        return APIClient().post(reverse('google-auth'), {'id_token': token})
+
+    def test_verified_locally_with_cached_keys(self):
+        with mock.patch('account.google.userinfo') as fetch_userinfo:
+            first = self.post(self.id_token())
+            second = self.post(self.id_token(iat=int(time.time()) - 5))
+        self.assertEqual(first.status_code, 200, first.data)
+        self.assertEqual(second.data['user']['email'], 'g@example.com')
+        fetch_userinfo.assert_not_called()
+        self.assertEqual(self.fetch_keys.call_count, 1)
+
+    def test_invalid_tokens_are_rejected(self):
+        for claims in ({'aud': 'someone-else'}, {'exp': int(time.time()) - 10},
+                       {'iss': 'https://evil.example.com'}, {'email_verified': False}):
+            with self.subTest(claims=claims):
+                self.assertEqual(self.post(self.id_token(**claims)).status_code, 400)
+        self.assertFalse(User.objects.exists())
+
+    def test_cache_entry_does_not_outlive_token(self):
+        token = self.id_token(exp=int(time.time()) + 1)
+        self.assertEqual(self.post(token).status_code, 200)
+        self.assertIsNotNone(google.token_cache.get(token))
+        time.sleep(1.1)
+        self.assertIsNone(google.token_cache.get(token))
+        self.assertEqual(self.post(token).status_code, 400)
+
+
+class LoginProtectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('cook@example.com', 'Cook', 'Book', 'Secret123')
+        User.objects.filter(pk=self.user.pk).update(is_email_verified=True)
+
+    def login(self, password='Secret123', email='cook@example.com', **extra):
+        return self.client.post(reverse('login'), {'email': email, 'password': password}, **extra)
+
+    def test_passwords_are_rehashed_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('Secret123', hasher='pbkdf2_sha256'))
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$argon2id$'))
+        self.assertIn('t=2', self.user.password)
+
+        with self.settings(ARGON2_TIME_COST=3):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIn('t=3', self.user.password)
+
+    def test_failures_per_email_block_before_hashing(self):
+        with mock.patch('account.views.authenticate', wraps=authenticate) as auth:
+            for _ in range(5):
+                self.assertEqual(self.login('wrong').status_code, 400)
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(auth.call_count, 5)
+
+    @override_settings(LOGIN_FAILURE_LIMIT_IP=3)
+    def test_failures_per_ip(self):
+        for i in range(3):
+            self.login('wrong', email=f'nobody{i}@example.com')
+        self.assertEqual(self.login().status_code, 429)
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_success_resets_email_failures(self):
+        for _ in range(4):
+            self.login('wrong')
+        self.assertEqual(self.login().status_code, 200)
+        for _ in range(4):
+            self.login('wrong')
+        self.assertEqual(self.login().status_code, 200)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        self.user = User.objects.create_user('cook@example.com', 'Cook', 'Book', 'Secret123')
+        self.user.is_email_verified = True
+        self.user.save()
+        self.client = APIClient()
+        response = self.client.post(reverse('login'), {'email': 'cook@example.com', 'password': 'Secret123'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+
+    def test_requests_do_not_load_the_user(self):
+        self.client.get(reverse('shoppinglist-list'))
+        with self.assertNumQueries(1):  # the shopping list itself
+            response = self.client.get(reverse('shoppinglist-list'))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse('shoppinglist-list'), {'name': 'Eggs', 'amount': '6', 'unit': 'pcs'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.user.shopping_list.get().name, 'Eggs')
+
+    def test_other_fields_load_once_through_the_cache(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['first_name'], 'Cook')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('profile'))
+
+        self.user.first_name = 'Chef'
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('profile')).data['first_name'], 'Chef')
+
+    def test_password_and_status_changes_revoke_tokens(self):
+        self.user.last_name = 'Renamed'
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+        self.user.set_password('Another123')
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+        self.client.credentials()
+        response = self.client.post(reverse('login'), {'email': 'cook@example.com', 'password': 'Another123'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+        user = User.objects.get()
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+    def test_deleting_the_user_revokes_tokens(self):
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get().delete()
+        self.assertIsNone(cache.get('account:token-version:None'))
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+    def test_rehash_on_login_keeps_tokens(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('Secret123', hasher='pbkdf2_sha256'))
+        self.client.post(reverse('login'), {'email': 'cook@example.com', 'password': 'Secret123'})
+        self.assertTrue(User.objects.get().password.startswith('argon2'))
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+    def test_tokens_without_claims_still_work(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.assertEqual(self.client.get(reverse('profile')).data['email'], 'cook@example.com')
+
+
+class EmailOTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        self.user = User.objects.create_user('cook@example.com', 'Cook', 'Book', 'Secret123')
+
+    def verify(self, code, email='cook@example.com'):
+        return self.client.post(reverse('verify-email'), {'email': email, 'code': code})
+
+    def test_code_is_stored_hashed_and_verified_in_one_lookup(self):
+        code = otp.issue(self.user)
+        pending = EmailOTP.objects.get()
+        self.assertNotIn(code, str(vars(pending)))
+        self.assertEqual(pending.email, 'cook@example.com')
+
+        with self.assertNumQueries(2):  # the lookup, and counting the failure
+            self.assertIsNone(otp.verify('cook@example.com', '00000'))
+        self.assertIsNone(otp.verify('other@example.com', code))
+
+        response = self.verify(code)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.get().is_email_verified)
+        self.assertFalse(EmailOTP.objects.exists())
+        self.assertEqual(self.verify(code).status_code, 400)
+
+    def test_expired_codes_are_rejected(self):
+        code = otp.issue(self.user)
+        EmailOTP.objects.update(expires_at=timezone.now())
+        self.assertEqual(self.verify(code).status_code, 400)
+        self.assertFalse(User.objects.get().is_email_verified)
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_code_stops_matching_after_too_many_attempts(self):
+        code = otp.issue(self.user)
+        for _ in range(3):
+            self.assertEqual(self.verify('00000').status_code, 400)
+        self.assertEqual(self.verify(code).status_code, 400)
+
+        # A new code starts over
+        code = otp.issue(self.user)
+        self.assertEqual(EmailOTP.objects.get().attempts, 0)
+        self.assertEqual(self.verify(code).status_code, 200)
+
+    def test_purge_deletes_expired_codes_in_batches(self):
+        for i in range(5):
+            user = User.objects.create_user(f'old{i}@example.com', 'Old', 'User', 'Secret123')
+            otp.issue(user)
+        EmailOTP.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        otp.issue(self.user)
+
+        with self.assertNumQueries(6):  # three batches of a select and a delete
+            self.assertEqual(otp.purge_expired(batch_size=2), 5)
+        self.assertEqual(list(EmailOTP.objects.values_list('email', flat=True)), ['cook@example.com'])
+        call_command('purge_expired_otps', verbosity=0)
+        self.assertEqual(EmailOTP.objects.count(), 1)
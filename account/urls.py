@@ -1,5 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from .views import RegisterView, LoginView, ProfileView, GoogleAuthView, VerifyEmailView
+from .views import (
+    RegisterView, LoginView, ProfileView, GoogleAuthView, VerifyEmailView,
+    AsyncRegisterView, AsyncLoginView, AsyncGoogleAuthView, AsyncVerifyEmailView,
+)
+
+if settings.ASYNC_ACCOUNT_VIEWS:
+    RegisterView, LoginView, GoogleAuthView, VerifyEmailView = (
+        AsyncRegisterView, AsyncLoginView, AsyncGoogleAuthView, AsyncVerifyEmailView
+    )
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -1,73 +1,118 @@
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import User, EmailOTP
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from . import google, otp, outbox, ratelimit
 from .serializers import RegisterSerializer, UserSerializer, VerifyEmailSerializer
-import random
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import ClaimsRefreshToken
 from django.contrib.auth import authenticate
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from social_django.utils import psa
+
+REGISTER_SCHEMA = dict(
+    request_body=RegisterSerializer,
+    responses={
+        201: openapi.Response('User created', UserSerializer),
+        400: 'Invalid input',
+    },
+)
+LOGIN_SCHEMA = dict(
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'email': openapi.Schema(type=openapi.TYPE_STRING, format='email'),
+            'password': openapi.Schema(type=openapi.TYPE_STRING, format='password'),
+        },
+        required=['email', 'password'],
+    ),
+    responses={
+        200: openapi.Response('Login successful', UserSerializer),
+        400: 'Invalid credentials',
+        429: 'Too many failed attempts',
+    },
+)
+VERIFY_EMAIL_SCHEMA = dict(
+    request_body=VerifyEmailSerializer,
+    responses={200: 'Email verified', 400: 'Invalid code'},
+)
+GOOGLE_AUTH_SCHEMA = dict(
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'access_token': openapi.Schema(type=openapi.TYPE_STRING, description='Google access token'),
+            'id_token': openapi.Schema(type=openapi.TYPE_STRING,
+                                       description='Google ID token (instead of access_token; verified locally)'),
+        },
+    ),
+    responses={
+        200: openapi.Response('Authentication successful', UserSerializer),
+        400: 'Invalid token or authentication error',
+    },
+)
+
+
+def send_verification_code(user):
+    # Mail is only queued here; the send_queued_email worker delivers it
+    with transaction.atomic():
+        code = otp.issue(user)
+        outbox.enqueue('Email Verification', f'Your verification code is {code}', [user.email], sensitive=True)
+
+
+def login_attempt(request, email, password):
+    """
+    authenticate() behind the failed-login limiter. Returns ``(user, retry_after)``;
+    while the email or IP is blocked no password is hashed at all.
+    """
+    ip = ratelimit.client_ip(request)
+    retry_after = ratelimit.retry_after(email, ip)
+    if retry_after:
+        return None, retry_after
+    user = authenticate(request, email=email, password=password)
+    if user is None:
+        ratelimit.record_failure(email, ip)
+    else:
+        ratelimit.reset(email)
+    return user, 0
+
+
+def too_many_attempts(retry_after):
+    return Response(
+        {'detail': 'Too many failed login attempts. Try again later.'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(retry_after)},
+    )
+
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
+    throttle_scope = 'register'
 
-    @swagger_auto_schema(
-        request_body=RegisterSerializer,
-        responses={
-            201: openapi.Response('User created', UserSerializer),
-            400: 'Invalid input',
-        },
-    )
+    @swagger_auto_schema(**REGISTER_SCHEMA)
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        code = f"{random.randint(100000, 999999)}"
-        EmailOTP.objects.update_or_create(user=user, defaults={'code': code})
-        send_mail(
-            'Email Verification',
-            f'Your verification code is {code}',
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-        )
+        send_verification_code(user)
         return Response({'detail': 'Verification code sent to email.'}, status=status.HTTP_201_CREATED)
 
 class LoginView(APIView):
-    @swagger_auto_schema(
-        request_body=openapi.Schema(
-            type=openapi.TYPE_OBJECT,
-            properties={
-                'email': openapi.Schema(type=openapi.TYPE_STRING, format='email'),
-                'password': openapi.Schema(type=openapi.TYPE_STRING, format='password'),
-            },
-            required=['email', 'password'],
-        ),
-        responses={
-            200: openapi.Response('Login successful', UserSerializer),
-            400: 'Invalid credentials',
-        },
-    )
+    throttle_scope = 'login'
+
+    @swagger_auto_schema(**LOGIN_SCHEMA)
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
-        user = authenticate(email=email, password=password)
+        user, retry_after = login_attempt(request, email, password)
+        if retry_after:
+            return too_many_attempts(retry_after)
         if not user:
             return Response({'detail': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
         if not user.is_email_verified:
-            code = f"{random.randint(100000, 999999)}"
-            EmailOTP.objects.update_or_create(user=user, defaults={'code': code})
-            send_mail(
-                'Email Verification',
-                f'Your verification code is {code}',
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-            )
+            send_verification_code(user)
             return Response({'detail': 'Email not verified. Verification code sent.'}, status=status.HTTP_400_BAD_REQUEST)
-        token = RefreshToken.for_user(user)
+        token = ClaimsRefreshToken.for_user(user)
         return Response({
             'user': UserSerializer(user).data,
             'token': str(token.access_token)
@@ -75,26 +120,18 @@ class LoginView(APIView):
 
 
 class VerifyEmailView(APIView):
-    @swagger_auto_schema(
-        request_body=VerifyEmailSerializer,
-        responses={200: 'Email verified', 400: 'Invalid code'},
-    )
+    throttle_scope = 'verify_email'
+
+    @swagger_auto_schema(**VERIFY_EMAIL_SCHEMA)
     def post(self, request):
         serializer = VerifyEmailSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data['email']
         code = serializer.validated_data['code']
-        try:
-            user = User.objects.get(email=email)
-            otp = user.email_otp
-        except (User.DoesNotExist, EmailOTP.DoesNotExist):
+        user = otp.verify(email, code)
+        if user is None:
             return Response({'detail': 'Invalid email or code'}, status=status.HTTP_400_BAD_REQUEST)
-        if otp.code != code:
-            return Response({'detail': 'Invalid email or code'}, status=status.HTTP_400_BAD_REQUEST)
-        user.is_email_verified = True
-        user.save()
-        otp.delete()
-        token = RefreshToken.for_user(user)
+        token = ClaimsRefreshToken.for_user(user)
         return Response({
             'user': UserSerializer(user).data,
             'token': str(token.access_token)
@@ -111,33 +148,108 @@ class ProfileView(APIView):
         return Response(UserSerializer(request.user).data)
 
 class GoogleAuthView(APIView):
-    @swagger_auto_schema(
-        request_body=openapi.Schema(
-            type=openapi.TYPE_OBJECT,
-            properties={
-                'access_token': openapi.Schema(type=openapi.TYPE_STRING, description='Google access token'),
-            },
-            required=['access_token'],
-        ),
-        responses={
-            200: openapi.Response('Authentication successful', UserSerializer),
-            400: 'Invalid token or authentication error',
-        },
-    )
-    @psa('social:complete')
+    throttle_scope = 'google_auth'
+
+    @swagger_auto_schema(**GOOGLE_AUTH_SCHEMA)
     def post(self, request, *args, **kwargs):
         token = request.data.get('access_token')
-        if not token:
+        id_token = request.data.get('id_token')
+        if not token and not id_token:
+            return Response({'error': 'No access token provided'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Authenticate using the ID token or the access token
+            if id_token:
+                user = google.authenticate_id_token(request, id_token)
+            else:
+                user = google.authenticate(request, token)
+        except Exception as e:
+            return Response({'error': f'Authentication error: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        return google_auth_response(user)
+
+
+def google_auth_response(user):
+    if user and user.is_active:
+        jwt_token = ClaimsRefreshToken.for_user(user)
+        return Response({
+            'user': UserSerializer(user).data,
+            'token': str(jwt_token.access_token)
+        }, status=status.HTTP_200_OK)
+    return Response({'error': 'Google authentication failed or user is inactive'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# --- Async variants (served when ASYNC_ACCOUNT_VIEWS is on, under ASGI) ---
+# Same requests and responses as the views above; outbound HTTP and the ORM are
+# awaited, so one worker keeps serving other requests while Google answers.
+class AsyncRegisterView(AsyncAPIView):
+    throttle_scope = 'register'
+
+    @swagger_auto_schema(**REGISTER_SCHEMA)
+    async def post(self, request, *args, **kwargs):
+        serializer = RegisterSerializer(data=request.data)
+        # UniqueValidator and create_user are sync ORM calls
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        user = await sync_to_async(serializer.save)()
+        await sync_to_async(send_verification_code)(user)
+        return Response({'detail': 'Verification code sent to email.'}, status=status.HTTP_201_CREATED)
+
+
+class AsyncLoginView(AsyncAPIView):
+    throttle_scope = 'login'
+
+    @swagger_auto_schema(**LOGIN_SCHEMA)
+    async def post(self, request):
+        # The social-auth backend has no aauthenticate(); hashing is CPU-bound anyway
+        user, retry_after = await sync_to_async(login_attempt)(
+            request, request.data.get('email'), request.data.get('password')
+        )
+        if retry_after:
+            return too_many_attempts(retry_after)
+        if not user:
+            return Response({'detail': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
+        if not user.is_email_verified:
+            await sync_to_async(send_verification_code)(user)
+            return Response({'detail': 'Email not verified. Verification code sent.'}, status=status.HTTP_400_BAD_REQUEST)
+        token = ClaimsRefreshToken.for_user(user)
+        return Response({
+            'user': UserSerializer(user).data,
+            'token': str(token.access_token)
+        }, status=status.HTTP_200_OK)
+
+
+class AsyncVerifyEmailView(AsyncAPIView):
+    throttle_scope = 'verify_email'
+
+    @swagger_auto_schema(**VERIFY_EMAIL_SCHEMA)
+    async def post(self, request):
+        serializer = VerifyEmailSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        email = serializer.validated_data['email']
+        code = serializer.validated_data['code']
+        user = await otp.averify(email, code)
+        if user is None:
+            return Response({'detail': 'Invalid email or code'}, status=status.HTTP_400_BAD_REQUEST)
+        token = ClaimsRefreshToken.for_user(user)
+        return Response({
+            'user': UserSerializer(user).data,
+            'token': str(token.access_token)
+        }, status=status.HTTP_200_OK)
+
+
+class AsyncGoogleAuthView(AsyncAPIView):
+    throttle_scope = 'google_auth'
+
+    @swagger_auto_schema(**GOOGLE_AUTH_SCHEMA)
+    async def post(self, request, *args, **kwargs):
+        token = request.data.get('access_token')
+        id_token = request.data.get('id_token')
+        if not token and not id_token:
             return Response({'error': 'No access token provided'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            # Authenticate using the access token
-            user = request.backend.do_auth(token)
-            if user and user.is_active:
-                jwt_token = RefreshToken.for_user(user)
-                return Response({
-                    'user': UserSerializer(user).data,
-                    'token': str(jwt_token.access_token)
-                }, status=status.HTTP_200_OK)
-            return Response({'error': 'Google authentication failed or user is inactive'}, status=status.HTTP_400_BAD_REQUEST)
+            if id_token:
+                # Only fetches Google's keys when they are not cached yet
+                user = await sync_to_async(google.authenticate_id_token)(request, id_token)
+            else:
+                user = await google.aauthenticate(request, token)
         except Exception as e:
             return Response({'error': f'Authentication error: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        return google_auth_response(user)
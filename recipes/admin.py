@@ -3,12 +3,13 @@ from .models import (
     Category, MealType,
     Recipe, Ingredient, Instruction,
     MealPlan, ShoppingListItem,
-    RecipeRating
+    RecipeRating, IngredientName
 )
 
 # Category va MealType’ni admin panelga qo‘shish
 admin.site.register(Category)
 admin.site.register(MealType)
+admin.site.register(IngredientName)
 
 # Ingredient va Instruction inlines
 class IngredientInline(admin.TabularInline):
@@ -0,0 +1,71 @@
+"""
+Ingredient autocomplete served from memory.
+
+Catalog names (already case-folded, see ``IngredientName.normalize``) are kept
+in a sorted key list so a prefix is found with a binary search. Every word of a
+multi-word name is indexed too, so ``oil`` finds "olive oil" after names that
+start with "oil". Matches are ranked by how many recipes use the ingredient.
+"""
+import bisect
+import heapq
+
+from django.db.models import Count
+
+from .memindex import LazyIndex
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+class AutocompleteIndex:
+    def __init__(self, rows):
+        keyed = []
+        self.entries = {}
+        for pk, name, uses in rows:
+            self.entries[pk] = (name, uses)
+            words = name.split(' ')
+            # (key, 0 = whole-name prefix / 1 = later-word prefix, id)
+            keyed.append((name, 0, pk))
+            keyed.extend((' '.join(words[i:]), 1, pk) for i in range(1, len(words)))
+        keyed.sort()
+        self.keys = [k for k, _, _ in keyed]
+        self.refs = [(group, pk) for _, group, pk in keyed]
+        self.top = heapq.nsmallest(MAX_LIMIT, self.entries, key=lambda pk: (-self.entries[pk][1], self.entries[pk][0]))
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        """Return ``(id, name, recipe_count)`` for the best ``limit`` matches of ``prefix``."""
+        if not prefix:
+            ids = self.top[:limit]
+        else:
+            best = {}
+            i = bisect.bisect_left(self.keys, prefix)
+            while i < len(self.keys) and self.keys[i].startswith(prefix):
+                group, pk = self.refs[i]
+                best[pk] = min(group, best.get(pk, group))
+                i += 1
+            ids = heapq.nsmallest(
+                limit, best, key=lambda pk: (best[pk], -self.entries[pk][1], self.entries[pk][0])
+            )
+        return [(pk, *self.entries[pk]) for pk in ids]
+
+
+def _build():
+    from .models import IngredientName
+
+    rows = (
+        IngredientName.objects
+        .annotate(uses=Count('ingredients__recipe', distinct=True))
+        .filter(uses__gt=0)
+        .values_list('id', 'name', 'uses')
+    )
+    return AutocompleteIndex(rows)
+
+
+_index = LazyIndex('recipes:autocomplete-index-version', _build)
+invalidate = _index.invalidate
+
+
+def lookup(text, limit=DEFAULT_LIMIT):
+    from .models import IngredientName
+
+    return _index.get().lookup(IngredientName.normalize(text or ''), limit)
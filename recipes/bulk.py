@@ -0,0 +1,210 @@
+"""
+Bulk recipe import/export as JSON Lines, one recipe per line:
+
+    {"name": "Omelette", "description": "...", "image": null, "prep_time": 5,
+     "cook_time": 10, "servings": 2, "healthy": false, "calories": null,
+     "protein": null, "fats": null, "carbs": null, "categories": ["Breakfast"],
+     "ingredients": [{"name": "egg", "amount": "2", "unit": "pcs", "preparation": null}],
+     "instructions": [{"step_number": 1, "description": "Whisk"}]}
+
+Both directions work on fixed-size batches from generators, so memory use
+depends on the batch size, not on the size of the catalog. Export pages through
+recipes by id (keyset, four queries per batch). Import writes each batch with
+``bulk_create`` in one transaction and refreshes the derived indexes
+(search, pantry, autocomplete, cached responses) once per batch. Categories
+are matched by name and created when missing.
+
+Progress can be saved to a checkpoint file after every committed batch (the
+last exported id, or the byte offset after the last imported line), so an
+interrupted run resumes where it stopped. The checkpoint is written just after
+the batch commits, so a crash in between imports that batch again on resume:
+check the last recipes before resuming a run that was killed rather than one
+that stopped on an invalid record.
+"""
+import json
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError, reset_queries, transaction
+
+from . import sync
+from .models import Category, Ingredient, IngredientName, Instruction, Recipe
+from .signals import ingredient_batch
+
+BATCH_SIZE = 500
+RECIPE_FIELDS = (
+    'name', 'description', 'image', 'prep_time', 'cook_time', 'servings', 'healthy',
+    'calories', 'protein', 'fats', 'carbs',
+)
+INGREDIENT_FIELDS = ('name', 'amount', 'unit', 'preparation')
+INSTRUCTION_FIELDS = ('step_number', 'description')
+REQUIRED_FIELDS = ('name', 'description', 'prep_time', 'cook_time', 'servings', 'ingredients', 'instructions')
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_checkpoint(path, key):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)[key]
+    return None
+
+
+def write_checkpoint(path, **values):
+    if path:
+        # Written aside and renamed, so a crash never leaves a torn checkpoint
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(values, f)
+        os.replace(f'{path}.tmp', path)
+
+
+def _forget_queries():
+    # With DEBUG on every query is kept in memory for the whole command
+    if settings.DEBUG:
+        reset_queries()
+
+
+# --- Export ---
+def export_batches(batch_size=BATCH_SIZE, after_id=0):
+    """Yield lists of ``(id, record)`` in id order, starting after ``after_id``."""
+    while True:
+        rows = list(
+            Recipe.objects.filter(id__gt=after_id).order_by('id').values('id', *RECIPE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return
+        ids = [row['id'] for row in rows]
+        records = {}
+        for row in rows:
+            record = {field: row[field] for field in RECIPE_FIELDS}
+            record['image'] = record['image'] or None
+            record.update(categories=[], ingredients=[], instructions=[])
+            records[row['id']] = record
+
+        links = Recipe.categories.through.objects.filter(recipe_id__in=ids).order_by('category_id')
+        for recipe_id, name in links.values_list('recipe_id', 'category__name'):
+            records[recipe_id]['categories'].append(name)
+        ingredients = Ingredient.objects.filter(recipe_id__in=ids).order_by('id')
+        for recipe_id, *values in ingredients.values_list('recipe_id', *INGREDIENT_FIELDS):
+            records[recipe_id]['ingredients'].append(dict(zip(INGREDIENT_FIELDS, values)))
+        instructions = Instruction.objects.filter(recipe_id__in=ids).order_by('step_number', 'id')
+        for recipe_id, *values in instructions.values_list('recipe_id', *INSTRUCTION_FIELDS):
+            records[recipe_id]['instructions'].append(dict(zip(INSTRUCTION_FIELDS, values)))
+
+        yield list(records.items())
+        after_id = ids[-1]
+        _forget_queries()
+
+
+# --- Import ---
+def read_batches(f, batch_size=BATCH_SIZE, offset=0):
+    """
+    Parse a binary JSONL file from byte ``offset`` on. Yields
+    ``(records, end_offset)``; ``end_offset`` is where the next batch starts,
+    i.e. the checkpoint to resume from once ``records`` are stored.
+    """
+    f.seek(offset)
+    batch = []
+    for line in f:
+        offset += len(line)
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise InvalidRecord(f"at byte {offset - len(line)}: {e}")
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch, offset
+            batch = []
+    if batch:
+        yield batch, offset
+
+
+class CategoryMap:
+    """Category name -> id for the whole import; only new names cost a query."""
+
+    def __init__(self):
+        self.ids = dict(Category.objects.values_list('name', 'id'))
+
+    def resolve(self, names):
+        missing = {name for name in names if name not in self.ids}
+        if missing:
+            Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+            self.ids.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+        return [self.ids[name] for name in names]
+
+
+def _clean(model, values, fields, label):
+    """Check ``values`` against the model fields (types, ranges, lengths), converting them in place."""
+    for field in fields:
+        if values.get(field) is None:
+            continue
+        try:
+            values[field] = model._meta.get_field(field).clean(values[field], None)
+        except ValidationError as e:
+            raise InvalidRecord(f"{label!r}: {field} {values[field]!r}: {' '.join(e.messages)}")
+
+
+def _validate(record):
+    if not isinstance(record, dict):
+        raise InvalidRecord("expected a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if record.get(field) in (None, '', [])]
+    if missing:
+        raise InvalidRecord(f"{record.get('name')!r}: missing {', '.join(missing)}")
+    children = (('ingredients', ('name', 'amount')), ('instructions', INSTRUCTION_FIELDS))
+    for field, required in children:
+        items = record[field]
+        if not isinstance(items, list) or not all(
+            isinstance(item, dict) and all(item.get(key) not in (None, '') for key in required) for item in items
+        ):
+            raise InvalidRecord(f"{record['name']!r}: every item of {field} needs {', '.join(required)}")
+    # image is a storage name, not an upload
+    _clean(Recipe, record, [field for field in RECIPE_FIELDS if field != 'image'], record['name'])
+    for ing in record['ingredients']:
+        _clean(Ingredient, ing, INGREDIENT_FIELDS, record['name'])
+    for step in record['instructions']:
+        _clean(Instruction, step, INSTRUCTION_FIELDS, record['name'])
+    categories = record.get('categories') or []
+    if not isinstance(categories, list) or not all(isinstance(name, str) and name for name in categories):
+        raise InvalidRecord(f"{record['name']!r}: categories must be names")
+
+
+def import_batch(records, categories):
+    """Insert one batch of records in a single transaction; returns the new recipe ids."""
+    for record in records:
+        _validate(record)
+    try:
+        return _insert(records, categories)
+    except (DataError, IntegrityError) as e:
+        # Whatever _validate can't see (e.g. a database-specific limit); the batch is rolled back
+        raise InvalidRecord(f"in the batch: {e}")
+
+
+def _insert(records, categories):
+    with transaction.atomic(), ingredient_batch() as touched:
+        recipes = Recipe.objects.bulk_create([
+            Recipe(**{field: record.get(field) for field in RECIPE_FIELDS if record.get(field) is not None})
+            for record in records
+        ])
+        links, ingredients, instructions = [], [], []
+        for recipe, record in zip(recipes, records):
+            for category_id in categories.resolve(record.get('categories') or []):
+                links.append(Recipe.categories.through(recipe_id=recipe.id, category_id=category_id))
+            for ing in record['ingredients']:
+                ingredients.append(Ingredient(recipe_id=recipe.id, **{f: ing.get(f) for f in INGREDIENT_FIELDS}))
+            for step in record['instructions']:
+                instructions.append(Instruction(recipe_id=recipe.id, **{f: step.get(f) for f in INSTRUCTION_FIELDS}))
+        catalog = IngredientName.ids_for(ing.name for ing in ingredients)
+        for ing in ingredients:
+            ing.catalog_id = catalog[ing.name]
+        Recipe.categories.through.objects.bulk_create(links, ignore_conflicts=True)
+        Ingredient.objects.bulk_create(ingredients)
+        Instruction.objects.bulk_create(instructions)
+        touched.update(recipe.id for recipe in recipes)
+        sync.guard_commit_lag(Recipe, [recipe.id for recipe in recipes], recipes[0].updated_at)
+    _forget_queries()
+    return [recipe.id for recipe in recipes]
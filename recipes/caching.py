@@ -0,0 +1,105 @@
+"""
+Response cache for public, rarely changing reads.
+
+Rendered list and detail responses are stored in the default cache under a key
+built from the normalized query string and a version stamp. Versions are
+nanosecond timestamps that signal handlers replace whenever the underlying rows
+change: one per resource group for list responses and one per object for
+detail responses. The version also serves as ``Last-Modified``, the ETag is a
+hash of the body, and conditional GETs are answered with 304.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def _version_key(group, pk=None):
+    return f'api-cache:{group}:version' if pk is None else f'api-cache:{group}:{pk}:version'
+
+
+def _bump(keys):
+    now = time.time_ns()
+    cache.set_many({key: now for key in keys}, None)
+
+
+def invalidate(group, pks=()):
+    """Expire list responses of ``group`` and detail responses of ``pks``."""
+    keys = [_version_key(group)] + [_version_key(group, pk) for pk in pks]
+    _bump(keys)
+    # Bump again on commit so a response rendered from pre-commit data is not kept
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def _version(group, pk=None):
+    key = _version_key(group, pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+class CachedResponseMixin:
+    """
+    Cache ``list`` and ``retrieve`` GET responses of a viewset.
+
+    ``cache_group`` names the versions the signal handlers bump; set
+    ``cache_anonymous_only`` to bypass the cache for authenticated users.
+    """
+    cache_group = None
+    cache_anonymous_only = False
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, None, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        object_pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.cached_response(request, object_pk, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, object_pk, handler, *args, **kwargs):
+        """Serve ``handler``'s response from the cache (list when ``object_pk`` is None)."""
+        if request.method not in ('GET', 'HEAD') or (
+            self.cache_anonymous_only and request.user.is_authenticated
+        ):
+            return handler(request, *args, **kwargs)
+
+        version = _version(self.cache_group, object_pk)
+        query = '&'.join(sorted(
+            f'{k}={v}' for k in request.query_params for v in request.query_params.getlist(k)
+        ))
+        key = 'api-cache:{}:{}:{}'.format(
+            self.cache_group,
+            version,
+            hashlib.md5(
+                f'{request.accepted_media_type}|{request.build_absolute_uri(request.path)}?{query}'.encode(),
+                usedforsecurity=False,
+            ).hexdigest(),
+        )
+        entry = cache.get(key)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response = self.finalize_response(request, response, *args, **kwargs)
+            response.render()
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest()),
+            }
+            cache.set(key, entry, settings.API_CACHE_TIMEOUT)
+
+        last_modified = version // 1_000_000_000
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return get_conditional_response(
+            request, etag=entry['etag'], last_modified=last_modified, response=response
+        )
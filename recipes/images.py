@@ -0,0 +1,194 @@
+"""
+Resized WebP variants of recipe images.
+
+Uploads are stored as sent; saving a recipe with a new image only queues it
+(``schedule``), and a small thread pool renders the variants after the
+transaction commits, so the request never decodes or encodes an image. For
+each size in ``SIZES`` (maximum width in pixels) a WebP file is written next to
+the original, e.g. ``recipes/soup.jpg`` -> ``recipes/soup.thumb.webp`` (or
+under its content hash with the default storage). EXIF
+data is dropped from the variants and, if present, from the original too
+(after applying its orientation): the original is rewritten and the upload
+deleted once no recipe refers to it. The result is recorded in
+``Recipe.image_variants`` together with the image it was made from, so variants
+of a replaced image are never served.
+
+With ``IMAGE_VARIANT_WORKERS = 0`` nothing is rendered in the web process and
+the ``generate_image_variants`` command does all the work; it also catches up
+on images whose variants were never made (e.g. after a restart).
+"""
+import functools
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.fields.json import KT
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import caching
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Maximum width per variant; smaller images are re-encoded but never upscaled
+SIZES = {'thumb': 160, 'card': 480, 'full': 1280}
+ORIENTATION = 0x0112  # EXIF tag
+
+
+def _storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def _upload_name(name, suffix=''):
+    # Derived files are saved like an upload of the same file, so a storage that
+    # renames uploads (see Mazzaly_backend.storage) files them the same way
+    filename = posixpath.basename(name)
+    if suffix:
+        filename = posixpath.splitext(filename)[0] + suffix
+    return posixpath.join(Recipe._meta.get_field('image').upload_to, filename)
+
+
+def variant_name(name, size):
+    return _upload_name(name, f'.{size}.webp')
+
+
+def represent(name, variants, request=None):
+    """``image_variants`` as the API returns it: a URL per size and a srcset, or None until rendered."""
+    if not name or variants.get('source') != name:
+        return None
+    storage = _storage()
+    data, srcset = {}, []
+    for size in SIZES:
+        url = storage.url(variants[size]['name'])
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        data[size] = url
+        srcset.append(f"{url} {variants[size]['width']}w")
+    data['srcset'] = ', '.join(srcset)
+    return data
+
+
+def _encode(image, format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _replace(storage, name, content):
+    # A deduplicating storage may share the old file with other rows: leave it
+    if not getattr(storage, 'deduplicates', False) and storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, content)
+
+
+def render(name):
+    """Write the variants of image ``name`` (and strip its EXIF); returns the ``image_variants`` value."""
+    storage = _storage()
+    with storage.open(name) as f:
+        original = Image.open(f)
+        original.load()
+    icc_profile = original.info.get('icc_profile')
+    exif = original.getexif()
+    upright = ImageOps.exif_transpose(original)
+
+    if exif:
+        if original.format == 'JPEG' and exif.get(ORIENTATION, 1) == 1:
+            # No rotation needed: keep the JPEG's own quantization tables, only the metadata goes
+            content = _encode(original, 'JPEG', quality='keep', subsampling='keep', icc_profile=icc_profile)
+        else:
+            options = {'quality': 90} if original.format == 'JPEG' else {}
+            content = _encode(upright, original.format, icc_profile=icc_profile, **options)
+        name = _replace(storage, _upload_name(name), content)
+
+    if upright.mode not in ('RGB', 'RGBA'):
+        upright = upright.convert('RGBA' if upright.has_transparency_data else 'RGB')
+    variants = {'source': name}
+    for size, width in SIZES.items():
+        image = upright
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        content = _encode(
+            image, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=4, icc_profile=icc_profile,
+        )
+        variants[size] = {
+            'name': _replace(storage, variant_name(name, size), content),
+            'width': image.width,
+            'height': image.height,
+        }
+    return variants
+
+
+def generate(recipe_id, force=False):
+    """Render the variants of a recipe's current image unless they are up to date."""
+    row = Recipe.objects.filter(pk=recipe_id).values('image', 'image_variants').first()
+    if row is None or not row['image']:
+        return None
+    if not force and row['image_variants'].get('source') == row['image']:
+        return row['image_variants']
+    variants = render(row['image'])
+    # Only if the image wasn't replaced meanwhile; the stripped original may have a new name
+    updated = Recipe.objects.filter(pk=recipe_id, image=row['image']).update(
+        image=variants['source'], image_variants=variants, updated_at=timezone.now(),
+    )
+    if updated:
+        caching.invalidate('recipes', [recipe_id])
+        _delete_stale(row['image_variants'], variants)
+        if variants['source'] != row['image']:
+            _delete_unreferenced(row['image'])
+    return variants
+
+
+def _delete_unreferenced(name):
+    # The original with its EXIF (GPS position included) must not stay
+    # downloadable; under a deduplicating storage only once no recipe uses it
+    storage = _storage()
+    if not Recipe.objects.filter(image=name).exists() and storage.exists(name):
+        storage.delete(name)
+
+
+def _delete_stale(old, new):
+    storage = _storage()
+    if getattr(storage, 'deduplicates', False):
+        return
+    keep = {new[size]['name'] for size in SIZES}
+    for size in SIZES:
+        name = old.get(size, {}).get('name')
+        if name and name not in keep:
+            storage.delete(name)
+
+
+def pending():
+    """Recipes with an image whose variants are missing or were made from an older image."""
+    return (
+        Recipe.objects.exclude(Q(image='') | Q(image__isnull=True))
+        .annotate(variants_source=KT('image_variants__source'))
+        .filter(Q(variants_source__isnull=True) | ~Q(variants_source=F('image')))
+    )
+
+
+def run(recipe_id, force=False):
+    """``generate`` for a worker thread: errors are logged, the thread's connection closed."""
+    try:
+        return generate(recipe_id, force)
+    except Exception:
+        logger.exception("Could not render image variants of recipe %s", recipe_id)
+    finally:
+        connection.close()
+
+
+@functools.cache
+def _executor():
+    return ThreadPoolExecutor(settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants')
+
+
+def schedule(recipe_id):
+    """Render the recipe's variants in the background once the current transaction commits."""
+    if settings.IMAGE_VARIANT_WORKERS:
+        transaction.on_commit(lambda: _executor().submit(run, recipe_id))
@@ -0,0 +1,74 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from recipes.models import ShoppingListItem
+
+UNTUNED = 'benchmark-untuned'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure write throughput of concurrent writers against the configured database. "
+        "Each write is a transaction that reads and then inserts, like a shopping list merge. "
+        "On SQLite, --compare first runs the same load with Django's default SQLite settings "
+        "(rollback journal, deferred transactions). Rows are written for a throwaway user "
+        "that is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help="Transactions per thread")
+        parser.add_argument('--compare', action='store_true')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            f'benchmark-{uuid.uuid4().hex[:8]}@example.com', 'Bench', 'Mark', uuid.uuid4().hex
+        )
+        runs = []
+        try:
+            if options['compare'] and connections['default'].vendor == 'sqlite':
+                connections.settings[UNTUNED] = {
+                    **connections.settings['default'],
+                    'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE;'},
+                }
+                runs.append(('Django defaults', UNTUNED))
+            runs.append(('configured', 'default'))
+            for label, alias in runs:
+                # journal_mode can only change while no other connection is open
+                connections.close_all()
+                elapsed, done, failed = self.run(alias, user.pk, options['threads'], options['writes'])
+                self.stdout.write(
+                    f"{label:16} {done / elapsed:8.0f} writes/s  "
+                    f"{done} committed, {failed} failed with 'database is locked'"
+                )
+        finally:
+            connections.close_all()
+            user.delete()
+
+    def run(self, alias, user_id, threads, writes):
+        def worker(n):
+            done = failed = 0
+            items = ShoppingListItem.objects.using(alias)
+            try:
+                for i in range(writes):
+                    try:
+                        with transaction.atomic(using=alias):
+                            items.filter(user_id=user_id, name=f'item {n}').count()
+                            items.create(user_id=user_id, name=f'item {n}', amount=str(i), unit='g')
+                        done += 1
+                    except OperationalError:
+                        failed += 1
+            finally:
+                connections[alias].close()
+            return done, failed
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(worker, range(threads)))
+        elapsed = time.perf_counter() - start
+        return elapsed, sum(d for d, _ in results), sum(f for _, f in results)
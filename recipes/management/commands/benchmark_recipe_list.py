@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from recipes import listing
+from recipes.models import Category, Recipe, Ingredient, IngredientName, Instruction
+from recipes.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare RecipeSerializer against the recipes.listing fast path on generated "
+        "recipes. Fixtures are created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients', type=int, default=8, help="Ingredients per recipe")
+        parser.add_argument('--steps', type=int, default=5, help="Instructions per recipe")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_fixtures(options['recipes'], options['ingredients'], options['steps'])
+            serializer_time, serializer_body = self.measure(options['repeat'], self.render_serializer)
+            fast_time, fast_body = self.measure(options['repeat'], self.render_fast)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{options['recipes']} recipes, {len(fast_body) / 1e6:.1f} MB of JSON")
+        self.stdout.write(f"RecipeSerializer: {serializer_time * 1000:8.0f} ms")
+        self.stdout.write(f"fast path:        {fast_time * 1000:8.0f} ms")
+        self.stdout.write(f"speedup:          {serializer_time / fast_time:8.1f}x")
+        if fast_body != serializer_body:
+            self.stderr.write(self.style.ERROR("Outputs differ!"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Outputs are byte-identical"))
+
+    def create_fixtures(self, count, ingredients, steps):
+        categories = Category.objects.bulk_create(
+            [Category(name=f'bench-category-{i}') for i in range(10)]
+        )
+        names = IngredientName.objects.bulk_create(
+            [IngredientName(name=f'bench-ingredient-{i}') for i in range(200)]
+        )
+        recipes = Recipe.objects.bulk_create([
+            Recipe(name=f'Recipe {i}', description='Lorem ipsum ' * 10, prep_time=i % 60,
+                   cook_time=i % 90, servings=i % 6 + 1, calories=i % 900, healthy=bool(i % 2))
+            for i in range(count)
+        ], batch_size=1000)
+        through = Recipe.categories.through
+        through.objects.bulk_create([
+            through(recipe_id=r.id, category_id=categories[r.id % 10].id) for r in recipes
+        ], batch_size=5000)
+        Ingredient.objects.bulk_create([
+            Ingredient(recipe=r, name=names[(r.id + j) % 200].name, catalog=names[(r.id + j) % 200],
+                       amount=str(j + 1), unit='g')
+            for r in recipes for j in range(ingredients)
+        ], batch_size=5000)
+        Instruction.objects.bulk_create([
+            Instruction(recipe=r, step_number=j + 1, description=f'Do step {j + 1}')
+            for r in recipes for j in range(steps)
+        ], batch_size=5000)
+
+    def measure(self, repeat, render):
+        best, body = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, body
+
+    def render_serializer(self):
+        queryset = Recipe.objects.with_details().order_by('-id')
+        return JSONRenderer().render(RecipeSerializer(queryset, many=True).data)
+
+    def render_fast(self):
+        queryset = listing.row_queryset(Recipe.objects.order_by('-id'))
+        return listing.FastJSONRenderer().render(listing.build(queryset))
@@ -0,0 +1,54 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Write every recipe (with categories, ingredients and instructions) as JSON Lines, "
+        "in id order and in batches, so memory use stays flat however large the catalog is. "
+        "Progress goes to stderr."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help="File to write (default: stdout)")
+        parser.add_argument('--batch-size', type=int, default=bulk.BATCH_SIZE)
+        parser.add_argument('--after-id', type=int, default=0, help="Only export recipes with a larger id")
+        parser.add_argument(
+            '--checkpoint',
+            help="File recording the last exported id; if it exists the export resumes "
+                 "after that id and appends to --output",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        if checkpoint and options['output'] == '-':
+            raise CommandError("--checkpoint needs --output: a resumed export appends to the file")
+        resumed = bulk.read_checkpoint(checkpoint, 'after_id')
+        after_id = options['after_id'] if resumed is None else resumed
+
+        out = sys.stdout if options['output'] == '-' else open(options['output'], 'w' if resumed is None else 'a')
+        exported = 0
+        start = time.perf_counter()
+        try:
+            for batch in bulk.export_batches(options['batch_size'], after_id):
+                out.writelines(json.dumps(record, ensure_ascii=False) + '\n' for _, record in batch)
+                out.flush()
+                after_id = batch[-1][0]
+                bulk.write_checkpoint(checkpoint, after_id=after_id)
+                exported += len(batch)
+                if options['verbosity'] > 1:
+                    self.progress(exported, start, after_id)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options['verbosity']:
+            self.progress(exported, start, after_id)
+
+    def progress(self, exported, start, after_id):
+        rate = exported / max(time.perf_counter() - start, 1e-9)
+        self.stderr.write(f"{exported} recipes exported ({rate:.0f}/s), last id {after_id}")
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from recipes import images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the resized WebP variants of recipe images that don't have up-to-date ones "
+        "(or of every image with --all). Run after deploys or from cron; with "
+        "IMAGE_VARIANT_WORKERS=0 this is the only place variants are made."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-render variants of every image")
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None) if options['all'] else images.pending()
+        ids = list(recipes.values_list('id', flat=True))
+        with ThreadPoolExecutor(max(1, options['workers'])) as pool:
+            results = list(pool.map(lambda pk: images.run(pk, force=options['all']), ids))
+        done = sum(result is not None for result in results)
+        self.stdout.write(self.style.SUCCESS(f"Image variants rendered for {done} recipes"))
+        if done < len(ids):
+            self.stderr.write(f"{len(ids) - done} failed, see the log")
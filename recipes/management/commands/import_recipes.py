@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Load recipes from a JSON Lines file (the export_recipes format). Each batch is "
+        "inserted with bulk_create in its own transaction. Search and other indexes are "
+        "updated as it goes; image variants are not, run generate_image_variants afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSONL file to import")
+        parser.add_argument('--batch-size', type=int, default=bulk.BATCH_SIZE)
+        parser.add_argument('--offset', type=int, default=0, help="Byte offset to start reading at")
+        parser.add_argument(
+            '--checkpoint',
+            help="File recording the byte offset after the last committed batch; "
+                 "if it exists the import resumes from there (a batch that committed just "
+                 "before a crash, without its checkpoint, is imported again)",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        resumed = bulk.read_checkpoint(checkpoint, 'offset')
+        offset = options['offset'] if resumed is None else resumed
+        if resumed is not None and options['verbosity']:
+            self.stdout.write(f"Resuming at byte {offset}")
+
+        categories = bulk.CategoryMap()
+        imported = 0
+        start = time.perf_counter()
+        with open(options['path'], 'rb') as f:
+            try:
+                for records, end in bulk.read_batches(f, options['batch_size'], offset):
+                    bulk.import_batch(records, categories)
+                    offset = end
+                    bulk.write_checkpoint(checkpoint, offset=offset)
+                    imported += len(records)
+                    if options['verbosity'] > 1:
+                        self.progress(imported, start)
+            except bulk.InvalidRecord as e:
+                if options['verbosity']:
+                    self.progress(imported, start)
+                raise CommandError(
+                    f"Invalid record {e}. The batches before it were imported; fix the file and "
+                    f"resume from byte {offset} (--offset, or rerun with the same --checkpoint)"
+                )
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(self.progress_line(imported, start)))
+
+    def progress_line(self, imported, start):
+        rate = imported / max(time.perf_counter() - start, 1e-9)
+        return f"{imported} recipes imported ({rate:.0f}/s)"
+
+    def progress(self, imported, start):
+        self.stdout.write(self.progress_line(imported, start))
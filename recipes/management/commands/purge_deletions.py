@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the records of deleted recipes, meal plans and shopping list items older than "
+        "SYNC_DELETION_RETENTION_DAYS. Run daily from cron; clients that haven't synced for "
+        "longer get a full resync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=sync.PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = sync.purge(options['batch_size'])
+        if options['verbosity']:
+            self.stdout.write(f"{deleted} deletion records purged")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import caching, ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Recipe.rating_count/rating_sum/avg_rating from RecipeRating rows; "
+        "only recipes whose aggregates drifted are written"
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            corrected = ratings.rebuild()
+        if corrected:
+            # The list version once, plus the details of the corrected recipes
+            caching.invalidate('recipes', corrected)
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(f"Rating aggregates corrected for {len(corrected)} recipes"))
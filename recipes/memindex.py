@@ -0,0 +1,49 @@
+"""
+Process-local, lazily built lookup structures.
+
+Each worker keeps its own copy of the index and rebuilds it when the version
+stamp stored in the default cache no longer matches the one it was built for.
+That cache must be shared by all workers (see ``CACHE_BACKEND``) for a change
+made through one worker to reach the others right away. The stamp also expires
+after ``INDEX_VERSION_TTL`` seconds, so with a process-local cache an index is
+at most that stale.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class LazyIndex:
+    def __init__(self, version_key, build):
+        self.version_key = version_key
+        self.build = build
+        self._lock = threading.Lock()
+        self._built = None  # (version, index)
+
+    def _version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, settings.INDEX_VERSION_TTL)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self):
+        version = self._version()
+        built = self._built
+        if built is not None and built[0] == version:
+            return built[1]
+        with self._lock:
+            if self._built is None or self._built[0] != version:
+                self._built = (version, self.build())
+            return self._built[1]
+
+    def _bump(self):
+        cache.set(self.version_key, uuid.uuid4().hex, settings.INDEX_VERSION_TTL)
+
+    def invalidate(self):
+        # Bump again on commit: another worker may rebuild from pre-commit data in between
+        self._bump()
+        transaction.on_commit(self._bump)
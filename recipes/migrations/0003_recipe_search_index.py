@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+TABLE = 'recipes_recipesearch'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE} ("
+            " recipe_id bigint PRIMARY KEY REFERENCES recipes_recipe (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,"
+            " document tsvector NOT NULL,"
+            " ingredients tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {TABLE}_document_gin ON {TABLE} USING GIN (document)")
+        schema_editor.execute(f"CREATE INDEX {TABLE}_ingredients_gin ON {TABLE} USING GIN (ingredients)")
+        schema_editor.execute(
+            f"INSERT INTO {TABLE} (recipe_id, document, ingredients)"
+            " SELECT r.id,"
+            "  setweight(to_tsvector('simple', r.name), 'A')"
+            "  || setweight(to_tsvector('simple', coalesce(c.names, '')), 'B')"
+            "  || setweight(to_tsvector('simple', coalesce(i.names, '')), 'C'),"
+            "  to_tsvector('simple', coalesce(i.names, ''))"
+            " FROM recipes_recipe r"
+            " LEFT JOIN (SELECT rc.recipe_id, string_agg(c.name, ' ') AS names"
+            "  FROM recipes_recipe_categories rc JOIN recipes_category c ON c.id = rc.category_id"
+            "  GROUP BY rc.recipe_id) c ON c.recipe_id = r.id"
+            " LEFT JOIN (SELECT recipe_id, string_agg(name, ' ') AS names"
+            "  FROM recipes_ingredient GROUP BY recipe_id) i ON i.recipe_id = r.id"
+        )
+    else:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+            "name, categories, ingredients, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {TABLE} (rowid, name, categories, ingredients)"
+            " SELECT r.id, r.name,"
+            "  coalesce((SELECT group_concat(c.name, ' ') FROM recipes_recipe_categories rc"
+            "   JOIN recipes_category c ON c.id = rc.category_id WHERE rc.recipe_id = r.id), ''),"
+            "  coalesce((SELECT group_concat(i.name, ' ') FROM recipes_ingredient i"
+            "   WHERE i.recipe_id = r.id), '')"
+            " FROM recipes_recipe r"
+        )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0002_remove_recipe_tags_ingredient_preparation_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
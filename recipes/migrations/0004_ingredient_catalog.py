@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='catalog',
+            field=models.ForeignKey(editable=False, help_text='Filled in from name on save', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ingredients', to='recipes.ingredientname'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def normalize(name):
+    return ' '.join(name.lower().split())
+
+
+def populate_catalog(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientName = apps.get_model('recipes', 'IngredientName')
+
+    rows = list(Ingredient.objects.values_list('id', 'name'))
+    names = sorted({normalize(name) for _, name in rows})
+    IngredientName.objects.bulk_create(
+        [IngredientName(name=name) for name in names], batch_size=500, ignore_conflicts=True
+    )
+    catalog = dict(IngredientName.objects.values_list('name', 'id'))
+
+    by_catalog = {}
+    for pk, name in rows:
+        by_catalog.setdefault(catalog[normalize(name)], []).append(pk)
+    for catalog_id, ids in by_catalog.items():
+        for start in range(0, len(ids), 500):
+            Ingredient.objects.filter(id__in=ids[start:start + 500]).update(catalog_id=catalog_id)
+
+
+def clear_catalog(apps, schema_editor):
+    apps.get_model('recipes', 'Ingredient').objects.update(catalog=None)
+    apps.get_model('recipes', 'IngredientName').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_catalog, clear_catalog),
+    ]
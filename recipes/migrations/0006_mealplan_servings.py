@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_populate_ingredient_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealplan',
+            name='servings',
+            field=models.PositiveIntegerField(blank=True, help_text="Planned servings (defaults to the recipe's)", null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:19
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_aggregates(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRating = apps.get_model('recipes', 'RecipeRating')
+    ratings = RecipeRating.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe')
+
+    def sub(aggregate):
+        return Subquery(ratings.annotate(value=aggregate).values('value')[:1])
+
+    Recipe.objects.update(
+        rating_count=Coalesce(sub(Count('id')), 0),
+        rating_sum=Coalesce(sub(Sum('rating')), 0),
+        avg_rating=Coalesce(sub(Avg('rating')), Value(0.0), output_field=FloatField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_mealplan_servings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='avg_rating',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
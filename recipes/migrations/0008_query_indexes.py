@@ -0,0 +1,84 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def drop_duplicate_ratings(apps, schema_editor):
+    # Keep each user's newest rating of a recipe before the unique constraint is added
+    RecipeRating = apps.get_model('recipes', 'RecipeRating')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    duplicates = (
+        RecipeRating.objects.values('recipe', 'user').order_by()
+        .annotate(n=Count('id'), keep=Max('id')).filter(n__gt=1)
+    )
+    recipe_ids = set()
+    for row in duplicates:
+        RecipeRating.objects.filter(recipe=row['recipe'], user=row['user']).exclude(pk=row['keep']).delete()
+        recipe_ids.add(row['recipe'])
+    if not recipe_ids:
+        return
+
+    ratings = RecipeRating.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe')
+
+    def sub(aggregate):
+        return Subquery(ratings.annotate(value=aggregate).values('value')[:1])
+
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        rating_count=Coalesce(sub(Count('id')), 0),
+        rating_sum=Coalesce(sub(Sum('rating')), 0),
+        avg_rating=Coalesce(sub(Avg('rating')), Value(0.0), output_field=FloatField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['user', 'scheduled_time', 'id'], name='mealplan_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('healthy', True)), fields=['-id'], name='recipe_healthy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('healthy', False)), fields=['-id'], name='recipe_not_healthy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['prep_time', 'id'], name='recipe_prep_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cook_time', 'id'], name='recipe_cook_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['servings', 'id'], name='recipe_servings_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglistitem',
+            index=models.Index(fields=['user', '-id'], name='shopping_user_id_idx'),
+        ),
+        # Covered by the composite indexes, which start with user_id
+        migrations.AlterField(
+            model_name='shoppinglistitem',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(drop_duplicate_ratings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reciperating',
+            constraint=models.UniqueConstraint(fields=('recipe', 'user'), name='unique_recipe_rating_per_user'),
+        ),
+    ]
@@ -16,6 +16,24 @@ class MealType(models.Model):
         return self.name
 
 # --- RECIPE ---
+class RecipeQuerySet(models.QuerySet):
+    def with_details(self, *relations):
+        """Prefetch what RecipeSerializer nests (all of it by default) so a page costs a fixed number of queries."""
+        lookups = {
+            # explicit orderings keep nested lists stable (and equal to recipes.listing)
+            'categories': models.Prefetch('categories', queryset=Category.objects.order_by('id')),
+            'ingredients': models.Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+            'instructions': 'instructions',
+        }
+        return self.prefetch_related(*(lookups[r] for r in (relations or lookups)))
+
+    def delete(self):
+        from .signals import recipe_deletion  # recipes.signals imports this module
+
+        with recipe_deletion(self.values_list('id', flat=True)):
+            return super().delete()
+
+
 class Recipe(models.Model):
     healthy = models.BooleanField(default=False, help_text="Show as Healthy Recipe")
     calories = models.PositiveIntegerField(blank=True, null=True, help_text="Calories in kcal (optional)")
@@ -28,19 +46,92 @@ class Recipe(models.Model):
 
     description = models.TextField()
     image = models.ImageField(upload_to='recipes/', blank=True, null=True)
+    # Resized WebP copies of image, written by recipes.images (never through save())
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     prep_time = models.PositiveIntegerField(help_text="in minutes")
     cook_time = models.PositiveIntegerField(help_text="in minutes")
     servings = models.PositiveIntegerField()
     #tags = models.CharField(max_length=255, blank=True, help_text="Comma-separated tags like 'healthy,vegetarian'")
-    
+
+    # Rating aggregates, maintained by recipes.ratings (never written through save())
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(default=0, db_index=True, editable=False)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeQuerySet.as_manager()
+
+    RATING_FIELDS = ('rating_count', 'rating_sum', 'avg_rating')
+    DERIVED_FIELDS = RATING_FIELDS + ('image_variants',)
+
+    class Meta:
+        indexes = [
+            # ?healthy= filter on the default newest-first list; partial indexes because
+            # a boolean filter compiles to a bare "WHERE healthy", not an equality
+            models.Index(fields=['-id'], condition=models.Q(healthy=True), name='recipe_healthy_idx'),
+            models.Index(fields=['-id'], condition=models.Q(healthy=False), name='recipe_not_healthy_idx'),
+            # ?ordering= columns (cursor pagination seeks on them)
+            models.Index(fields=['prep_time', 'id'], name='recipe_prep_time_idx'),
+            models.Index(fields=['cook_time', 'id'], name='recipe_cook_time_idx'),
+            models.Index(fields=['servings', 'id'], name='recipe_servings_idx'),
+            # /api/recipes/export/?updated_since= (streams in this order)
+            models.Index(fields=['updated_at', 'id'], name='recipe_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Don't write back a stale in-memory copy of the rating aggregates or image variants
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        from .signals import recipe_deletion  # recipes.signals imports this module
+
+        with recipe_deletion([self.pk]):
+            return super().delete(*args, **kwargs)
+
+# --- INGREDIENT CATALOG ---
+class IngredientName(models.Model):
+    """Canonical ingredient; every Ingredient row with the same normalized name points here."""
+    name = models.CharField(max_length=255, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join(name.lower().split())
+
+    @classmethod
+    def ids_for(cls, names):
+        """Map each name to its catalog id, creating missing entries in bulk."""
+        normalized = {name: cls.normalize(name) for name in names}
+        wanted = set(normalized.values())
+        found = dict(cls.objects.filter(name__in=wanted).values_list('name', 'id'))
+        missing = wanted - found.keys()
+        if missing:
+            cls.objects.bulk_create([cls(name=name) for name in missing], ignore_conflicts=True)
+            found.update(cls.objects.filter(name__in=missing).values_list('name', 'id'))
+        return {name: found[norm] for name, norm in normalized.items()}
+
 # --- INGREDIENT ---
 class Ingredient(models.Model):
     recipe = models.ForeignKey(Recipe, related_name='ingredients', on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
+    catalog = models.ForeignKey(
+        IngredientName, related_name='ingredients', on_delete=models.PROTECT,
+        null=True, editable=False, help_text="Filled in from name on save"
+    )
     amount = models.CharField(max_length=100)
     unit = models.CharField(max_length=50, blank=True, null=True)
     preparation = models.CharField(max_length=100, blank=True, null=True, help_text="Optional: large, grated, cubed, etc.")
@@ -48,6 +139,20 @@ class Ingredient(models.Model):
     def __str__(self):
         return f"{self.amount} {self.unit} {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The name the stored catalog_id was resolved from
+        instance._catalogued_name = instance.__dict__.get('name')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Only look the catalog up when the name is new or changed, never to compare
+        if self.catalog_id is None or self.name != getattr(self, '_catalogued_name', None):
+            self.catalog_id = IngredientName.ids_for([self.name])[self.name]
+        super().save(*args, **kwargs)
+        self._catalogued_name = self.name
+
 # --- INSTRUCTION ---
 class Instruction(models.Model):
     recipe = models.ForeignKey(Recipe, related_name='instructions', on_delete=models.CASCADE)
@@ -61,22 +166,55 @@ class Instruction(models.Model):
         return f"Step {self.step_number}: {self.description[:50]}..."
 
 # --- MEAL PLAN ---
+class MealPlanQuerySet(models.QuerySet):
+    def with_details(self):
+        """What MealPlanSerializer nests, loaded in a fixed number of queries."""
+        return self.select_related('meal_type').prefetch_related(
+            models.Prefetch('recipe', queryset=Recipe.objects.with_details())
+        )
+
+
 class MealPlan(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='meal_plans')
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
     meal_type = models.ForeignKey(MealType, on_delete=models.SET_NULL, null=True, related_name='meal_plans')
     scheduled_time = models.DateTimeField()
+    servings = models.PositiveIntegerField(blank=True, null=True, help_text="Planned servings (defaults to the recipe's)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = MealPlanQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # user's plans by date (list ordering, from-meal-plan ranges)
+            models.Index(fields=['user', 'scheduled_time', 'id'], name='mealplan_user_time_idx'),
+            # /api/sync/ pages
+            models.Index(fields=['user', 'updated_at', 'id'], name='mealplan_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.recipe} - {self.meal_type} at {self.scheduled_time}"
 
 # --- SHOPPING LIST ITEM ---
 class ShoppingListItem(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='shopping_list')
+    # Indexed by the composite indexes below, which all start with user
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='shopping_list', db_index=False
+    )
     name = models.CharField(max_length=255)
     amount = models.CharField(max_length=100)
     unit = models.CharField(max_length=50)
     checked = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # /api/shopping-list/ (IdCursorPagination, newest first) and the merge in
+            # recipes.shopping; a plain user index leaves PostgreSQL sorting every page
+            models.Index(fields=['user', '-id'], name='shopping_user_id_idx'),
+            # /api/sync/ pages
+            models.Index(fields=['user', 'updated_at', 'id'], name='shopping_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.amount} {self.unit} {self.name} ({'done' if self.checked else 'pending'})"
@@ -89,5 +227,43 @@ class RecipeRating(models.Model):
     comment = models.TextField(blank=True)
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'user'], name='unique_recipe_rating_per_user'),
+        ]
+
     def __str__(self):
         return f"{self.user} rated {self.recipe} as {self.rating}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the recipe aggregates currently include for this row
+        instance._counted = (instance.__dict__.get('recipe_id'), instance.__dict__.get('rating'))
+        return instance
+
+# --- DELETIONS (incremental sync) ---
+class Deletion(models.Model):
+    """A deleted recipe, meal plan or shopping list item, reported by /api/sync/ (see recipes.sync)."""
+    RECIPE = 'recipe'
+    MEAL_PLAN = 'meal_plan'
+    SHOPPING_LIST_ITEM = 'shopping_list_item'
+    KINDS = [(RECIPE, 'Recipe'), (MEAL_PLAN, 'Meal plan'), (SHOPPING_LIST_ITEM, 'Shopping list item')]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    # Owner of a deleted plan or item; None for recipes, which every client sees.
+    # No constraint: a user's rows are recorded while the user is being deleted.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # /api/sync/ pages
+            models.Index(fields=['deleted_at', 'id'], name='deletion_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at {self.deleted_at}"
@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Newest first, keyed on the primary key so pages stay stable while rows are added."""
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RecipeCursorPagination(IdCursorPagination):
+    def get_ordering(self, request, queryset, view):
+        # Full-text results page in relevance order unless ?ordering= is given
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get('ordering'):
+            return ('-search_rank', 'id')
+        return super().get_ordering(request, queryset, view)
+
+
+class MealPlanCursorPagination(IdCursorPagination):
+    ordering = ('scheduled_time', 'id')
@@ -0,0 +1,53 @@
+"""
+"What can I cook" matching against the ingredient catalog.
+
+Recipes are held in memory as an inverted index (catalog id -> recipe ids) plus
+the number of distinct catalog ingredients per recipe. Ranking a pantry then
+only touches recipes that share at least one ingredient with it, and no SQL
+runs at all until the index is invalidated.
+
+The index is rebuilt lazily whenever the version stamp in the cache changes;
+``invalidate()`` is called from the Ingredient signal handlers.
+"""
+import heapq
+from collections import Counter
+
+from .memindex import LazyIndex
+
+
+class PantryIndex:
+    def __init__(self, pairs):
+        postings, recipe_sets = {}, {}
+        for recipe_id, catalog_id in pairs:
+            recipe_sets.setdefault(recipe_id, set()).add(catalog_id)
+        for recipe_id, catalog_ids in recipe_sets.items():
+            for catalog_id in catalog_ids:
+                postings.setdefault(catalog_id, []).append(recipe_id)
+        self.postings = {k: tuple(v) for k, v in postings.items()}
+        self.sizes = {k: len(v) for k, v in recipe_sets.items()}
+
+    def rank(self, pantry_ids, limit):
+        """
+        Return ``(recipe_id, matched, missing)`` for the best ``limit`` recipes:
+        fully makeable first, then fewest missing, then most matched.
+        """
+        matched = Counter()
+        for catalog_id in set(pantry_ids):
+            matched.update(self.postings.get(catalog_id, ()))
+        best = heapq.nsmallest(
+            limit,
+            ((self.sizes[recipe_id] - count, -count, recipe_id) for recipe_id, count in matched.items()),
+        )
+        return [(recipe_id, -neg_count, missing) for missing, neg_count, recipe_id in best]
+
+
+def _build():
+    from .models import Ingredient
+
+    pairs = Ingredient.objects.filter(catalog__isnull=False).values_list('recipe_id', 'catalog_id')
+    return PantryIndex(pairs.iterator(chunk_size=5000))
+
+
+_index = LazyIndex('recipes:pantry-index-version', _build)
+get_index = _index.get
+invalidate = _index.invalidate
@@ -0,0 +1,65 @@
+"""
+Incremental maintenance of the rating aggregates stored on Recipe.
+
+Every rating change is applied as a single ``UPDATE`` of ``rating_count``,
+``rating_sum`` and ``avg_rating`` with F() expressions, so concurrent ratings
+never overwrite each other and reading an average never needs ``Avg()``.
+"""
+from django.db.models import Avg, Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+
+def _subquery(ratings, aggregate):
+    return Subquery(ratings.annotate(value=aggregate).values('value')[:1])
+
+
+def apply_delta(recipe_id, count_delta, sum_delta):
+    """Add ``count_delta`` ratings totalling ``sum_delta`` to a recipe's aggregates."""
+    from .models import Recipe
+    from .sync import guard_commit_lag
+
+    now = timezone.now()
+    # SET expressions all see the row's old values
+    Recipe.objects.filter(pk=recipe_id).update(
+        rating_count=F('rating_count') + count_delta,
+        rating_sum=F('rating_sum') + sum_delta,
+        avg_rating=Case(
+            When(rating_count__lte=-count_delta, then=Value(0.0)),
+            default=Cast(F('rating_sum') + sum_delta, FloatField()) / (F('rating_count') + count_delta),
+            output_field=FloatField(),
+        ),
+        updated_at=now,
+    )
+    guard_commit_lag(Recipe, [recipe_id], now)
+
+
+def rebuild(recipes=None, batch_size=1000):
+    """
+    Recompute the aggregates of ``recipes`` (all recipes by default) from
+    RecipeRating. Only recipes whose stored count or sum is off are written,
+    so a rebuild doesn't mark the whole catalog as changed for /api/sync/.
+    Returns the ids of the recipes that were corrected.
+    """
+    from .models import Recipe, RecipeRating
+    from .sync import guard_commit_lag
+
+    recipes = Recipe.objects.all() if recipes is None else recipes
+    ratings = RecipeRating.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe')
+    count = Coalesce(_subquery(ratings, Count('id')), 0)
+    total = Coalesce(_subquery(ratings, Sum('rating')), 0)
+    stale = recipes.annotate(actual_count=count, actual_sum=total).exclude(
+        rating_count=F('actual_count'), rating_sum=F('actual_sum'),
+    )
+    ids = list(stale.values_list('id', flat=True))
+    now = timezone.now()
+    for start in range(0, len(ids), batch_size):
+        Recipe.objects.filter(pk__in=ids[start:start + batch_size]).update(
+            rating_count=count,
+            rating_sum=total,
+            avg_rating=Coalesce(_subquery(ratings, Avg('rating')), Value(0.0), output_field=FloatField()),
+            updated_at=now,
+        )
+    if ids:
+        guard_commit_lag(Recipe, ids, now)
+    return ids
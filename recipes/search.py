@@ -0,0 +1,173 @@
+"""
+Full-text search index for recipes.
+
+SQLite keeps an FTS5 virtual table whose rowid is the recipe id; PostgreSQL
+keeps a table of weighted tsvectors behind a GIN index. Both hold the recipe
+name, its category names and its ingredient names, and are kept in sync by the
+signal handlers in ``recipes.signals``.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+TABLE = 'recipes_recipesearch'
+
+# bm25 column weights for name, categories, ingredients
+_SQLITE_WEIGHTS = '10.0, 5.0, 2.0'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# --- Index maintenance ---
+def _documents(recipe_ids):
+    from .models import Recipe, Ingredient
+
+    docs = {
+        pk: {'name': name, 'categories': [], 'ingredients': []}
+        for pk, name in Recipe.objects.filter(id__in=recipe_ids).values_list('id', 'name')
+    }
+    through = Recipe.categories.through
+    for recipe_id, category in through.objects.filter(recipe_id__in=docs).values_list(
+        'recipe_id', 'category__name'
+    ):
+        docs[recipe_id]['categories'].append(category)
+    for recipe_id, name in Ingredient.objects.filter(recipe_id__in=docs).values_list('recipe_id', 'name'):
+        docs[recipe_id]['ingredients'].append(name)
+    return docs
+
+
+def reindex(recipe_ids):
+    """(Re)build index rows for ``recipe_ids``; ids of deleted recipes are dropped."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    docs = _documents(recipe_ids)
+    rows = [
+        (pk, doc['name'], ' '.join(doc['categories']), ' '.join(doc['ingredients']))
+        for pk, doc in docs.items()
+    ]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"DELETE FROM {TABLE} WHERE recipe_id = ANY(%s)", [recipe_ids])
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (recipe_id, document, ingredients) VALUES ("
+                " %s,"
+                " setweight(to_tsvector('simple', %s), 'A')"
+                " || setweight(to_tsvector('simple', %s), 'B')"
+                " || setweight(to_tsvector('simple', %s), 'C'),"
+                " to_tsvector('simple', %s))",
+                [(pk, name, cats, ings, ings) for pk, name, cats, ings in rows],
+            )
+        else:
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", recipe_ids)
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (rowid, name, categories, ingredients) VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+
+
+def rebuild(batch_size=500):
+    """
+    Rebuild the whole index in one transaction: searches keep using the old
+    index until the new one is committed, and a failed rebuild changes nothing.
+    """
+    from .models import Recipe
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+        ids = list(Recipe.objects.values_list('id', flat=True))
+        for start in range(0, len(ids), batch_size):
+            reindex(ids[start:start + batch_size])
+
+
+# --- Querying ---
+def _terms(values):
+    """Split user input into token lists, dropping anything that is not a word character."""
+    terms = []
+    for value in values:
+        tokens = _TOKEN_RE.findall(value.lower())
+        if tokens:
+            terms.append(tokens)
+    return terms
+
+
+def _sqlite_match(text_terms, ingredient_terms):
+    def phrase(tokens):
+        return '"' + ' '.join(tokens) + '" *'
+
+    clauses = [phrase(t) for t in text_terms]
+    if ingredient_terms:
+        clauses.append('ingredients : (' + ' AND '.join(phrase(t) for t in ingredient_terms) + ')')
+    return ' AND '.join(clauses)
+
+
+def _pg_tsquery(terms):
+    return ' & '.join(' <-> '.join(tokens) + ':*' for tokens in terms)
+
+
+def search(queryset, text_terms=(), ingredient_terms=()):
+    """
+    Restrict ``queryset`` to recipes matching every term and order it by relevance.
+
+    ``text_terms`` match the name, category names or ingredient names;
+    ``ingredient_terms`` must each match an ingredient name (AND search).
+    Matching is by word prefix, so ``egg`` finds "eggs".
+    """
+    text_terms = _terms(text_terms)
+    ingredient_terms = _terms(ingredient_terms)
+    if not text_terms and not ingredient_terms:
+        return queryset
+
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        conditions, params = [], []
+        if text_terms:
+            conditions.append("document @@ to_tsquery('simple', %s)")
+            params.append(_pg_tsquery(text_terms))
+        if ingredient_terms:
+            conditions.append("ingredients @@ to_tsquery('simple', %s)")
+            params.append(_pg_tsquery(ingredient_terms))
+        where = ' AND '.join(conditions)
+        rank_query = _pg_tsquery(text_terms + ingredient_terms)
+        matches = RawSQL(f"SELECT recipe_id FROM {TABLE} WHERE {where}", params)
+        rank = RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('simple', %s)) FROM {TABLE}"
+            f" WHERE recipe_id = {table}.id",
+            [rank_query],
+            output_field=FloatField(),
+        )
+    else:
+        match = _sqlite_match(text_terms, ingredient_terms)
+        matches = RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [match])
+        rank = RawSQL(
+            f"SELECT -bm25({TABLE}, {_SQLITE_WEIGHTS}) FROM {TABLE}"
+            f" WHERE {TABLE} MATCH %s AND rowid = {table}.id",
+            [match],
+            output_field=FloatField(),
+        )
+    return queryset.filter(id__in=matches).annotate(search_rank=rank).order_by('-search_rank', 'id')
+
+
+def _split(value):
+    return [v for v in (value or '').split(',') if v.strip()]
+
+
+class RecipeSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the full-text index instead of ``LIKE '%x%'`` joins.
+
+    Handles ``?search=`` (whitespace/comma separated, every term must match) and
+    ``?ingredients=egg,milk`` (every ingredient must be in the recipe).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return search(
+            queryset,
+            text_terms=self.get_search_terms(request),
+            ingredient_terms=_split(request.query_params.get('ingredients')),
+        )
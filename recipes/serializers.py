@@ -1,10 +1,13 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import (
     Category, MealType, Recipe,
     Ingredient, Instruction,
     MealPlan, ShoppingListItem,
-    RecipeRating
+    RecipeRating, IngredientName
 )
+from . import images
+from .signals import ingredient_batch
 
 # CATEGORY
 class CategorySerializer(serializers.ModelSerializer):
@@ -20,24 +23,119 @@ class MealTypeSerializer(serializers.ModelSerializer):
 
 # INGREDIENT (autocomplete uchun name + id yetarli)
 class IngredientSerializer(serializers.ModelSerializer):
+    # Optional on write: lets a recipe update keep the row (see _sync_children)
+    id = serializers.IntegerField(required=False)
+    catalog_id = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Ingredient
-        fields = ['id', 'name', 'amount', 'unit', 'preparation']
+        fields = ['id', 'name', 'catalog_id', 'amount', 'unit', 'preparation']
 
 # Faqat name va id uchun (autocomplete/search API uchun)
 class IngredientNameSerializer(serializers.ModelSerializer):
+    recipe_count = serializers.IntegerField(read_only=True)
+
     class Meta:
-        model = Ingredient
-        fields = ['id', 'name']
+        model = IngredientName
+        fields = ['id', 'name', 'recipe_count']
 
 # INSTRUCTION
 class InstructionSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Instruction
         fields = ['id', 'step_number', 'description']
 
+# Nested yozuvlar uchun yordamchilar
+def _without_id(data):
+    return {k: v for k, v in data.items() if k != 'id'}
+
+
+def _sync_children(recipe, model, existing, items, key, fields):
+    """
+    Diff validated child ``items`` against the ``existing`` rows of ``recipe``.
+
+    An item is matched to a row by ``id`` when the client sends one, otherwise by
+    ``key``. Matched rows keep their primary key and are only updated when one of
+    ``fields`` changed; unmatched rows are deleted.
+    Returns unsaved ``(to_create, to_update, to_delete)`` instances.
+    """
+    unmatched = {obj.pk: obj for obj in existing}
+    by_key = {}
+    for obj in unmatched.values():
+        by_key.setdefault(key(obj), []).append(obj)
+
+    to_create, to_update = [], []
+    for item in items:
+        data = _without_id(item)
+        obj = unmatched.pop(item.get('id'), None)
+        if obj is None:
+            for candidate in by_key.get(key(model(**data)), ()):
+                if candidate.pk in unmatched:
+                    obj = unmatched.pop(candidate.pk)
+                    break
+        if obj is None:
+            to_create.append(model(recipe=recipe, **data))
+            continue
+        changed = False
+        for field in fields:
+            value = data.get(field, model._meta.get_field(field).get_default())
+            if getattr(obj, field) != value:
+                setattr(obj, field, value)
+                changed = True
+        if changed:
+            to_update.append(obj)
+    return to_create, to_update, list(unmatched.values())
+
+
+def _apply_sync(model, to_create, to_update, to_delete, fields):
+    if to_delete:
+        model.objects.filter(pk__in=[obj.pk for obj in to_delete]).delete()
+    if to_update:
+        model.objects.bulk_update(to_update, fields)
+    if to_create:
+        model.objects.bulk_create(to_create)
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(to_delete)}
+
+
+def _set_catalog(ingredients):
+    catalog = IngredientName.ids_for(ing.name for ing in ingredients)
+    for ing in ingredients:
+        ing.catalog_id = catalog[ing.name]
+
+# ?fields= / ?expand= (faqat GET so'rovlar uchun)
+class SparseFieldsMixin:
+    """
+    ``?fields=a,b`` limits a top-level GET response to those fields; ``summary``
+    stands for ``Meta.summary_fields``. ``?expand=`` adds fields (e.g. nested
+    children) on top of that. Without ``?fields=`` every field is returned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        wanted = self.requested_fields(request.query_params)
+        if wanted is not None:
+            for name in list(self.fields):
+                if name not in wanted:
+                    self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, query_params):
+        """Names of the fields asked for, or None when all of them are."""
+        fields = {f.strip() for f in query_params.get('fields', '').split(',') if f.strip()}
+        if not fields:
+            return None
+        if 'summary' in fields:
+            fields |= set(getattr(cls.Meta, 'summary_fields', ()))
+        fields |= {f.strip() for f in query_params.get('expand', '').split(',') if f.strip()}
+        return fields
+
 # RECIPE
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
     category_ids = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -47,29 +145,44 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     ingredients = IngredientSerializer(many=True)
     instructions = InstructionSerializer(many=True)
+    # {"thumb": url, "card": url, "full": url, "srcset": "..."} once rendered (see recipes.images)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = [
-            'id', 'name', 'categories', 'category_ids', 'description', 'image',
+            'id', 'name', 'categories', 'category_ids', 'description', 'image', 'image_variants',
             'prep_time', 'cook_time', 'servings', 'healthy', #'tags',
-            'calories', 'protein', 'fats', 'carbs',
+            'calories', 'protein', 'fats', 'carbs', 'rating_count', 'avg_rating', 'updated_at',
             'ingredients', 'instructions'
         ]
+        summary_fields = [
+            'id', 'name', 'image', 'image_variants', 'prep_time', 'cook_time', 'servings', 'healthy',
+            'calories', 'protein', 'fats', 'carbs', 'rating_count', 'avg_rating',
+        ]
 
+    def get_image_variants(self, obj):
+        return images.represent(obj.image.name, obj.image_variants, self.context.get('request'))
+
+    @transaction.atomic
     def create(self, validated_data):
         categories_data = validated_data.pop('categories', [])
         ingredients_data = validated_data.pop('ingredients')
         instructions_data = validated_data.pop('instructions')
-        recipe = Recipe.objects.create(**validated_data)
-        if categories_data:
-            recipe.categories.set(categories_data)
-        for ing in ingredients_data:
-            Ingredient.objects.create(recipe=recipe, **ing)
-        for step in instructions_data:
-            Instruction.objects.create(recipe=recipe, **step)
+        with ingredient_batch() as touched:
+            recipe = Recipe.objects.create(**validated_data)
+            if categories_data:
+                recipe.categories.set(categories_data)
+            ingredients = [Ingredient(recipe=recipe, **_without_id(ing)) for ing in ingredients_data]
+            _set_catalog(ingredients)
+            Ingredient.objects.bulk_create(ingredients)
+            Instruction.objects.bulk_create([
+                Instruction(recipe=recipe, **_without_id(step)) for step in instructions_data
+            ])
+            touched.add(recipe.id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         categories_data = validated_data.pop('categories', None)
         ingredients_data = validated_data.pop('ingredients', None)
@@ -81,14 +194,31 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         if categories_data is not None:
             instance.categories.set(categories_data)
+        # rows written per child table, e.g. {'ingredients': {'created': 1, 'updated': 0, 'deleted': 2}}
+        self.rows_touched = {}
         if ingredients_data is not None:
-            instance.ingredients.all().delete()
-            for ing in ingredients_data:
-                Ingredient.objects.create(recipe=instance, **ing)
+            with ingredient_batch() as touched:
+                create, update, delete = _sync_children(
+                    instance, Ingredient, instance.ingredients.all(), ingredients_data,
+                    key=lambda ing: IngredientName.normalize(ing.name),
+                    fields=['name', 'amount', 'unit', 'preparation'],
+                )
+                _set_catalog(create + update)
+                self.rows_touched['ingredients'] = _apply_sync(
+                    Ingredient, create, update, delete,
+                    fields=['name', 'catalog', 'amount', 'unit', 'preparation'],
+                )
+                if create or update or delete:
+                    touched.add(instance.id)
         if instructions_data is not None:
-            instance.instructions.all().delete()
-            for step in instructions_data:
-                Instruction.objects.create(recipe=instance, **step)
+            create, update, delete = _sync_children(
+                instance, Instruction, instance.instructions.all(), instructions_data,
+                key=lambda step: step.step_number,
+                fields=['step_number', 'description'],
+            )
+            self.rows_touched['instructions'] = _apply_sync(
+                Instruction, create, update, delete, fields=['step_number', 'description'],
+            )
         return instance
 
     def validate(self, data):
@@ -98,6 +228,21 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Recipe must have at least one instruction.")
         return data
 
+# "What can I cook" natijalari uchun
+class CookableRecipeSerializer(RecipeSerializer):
+    """RecipeSerializer plus pantry coverage; counts come from context['coverage'][recipe.id]."""
+    matched_ingredients = serializers.SerializerMethodField()
+    missing_ingredients = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['matched_ingredients', 'missing_ingredients']
+
+    def get_matched_ingredients(self, obj):
+        return self.context['coverage'][obj.id][0]
+
+    def get_missing_ingredients(self, obj):
+        return self.context['coverage'][obj.id][1]
+
 # MEAL PLAN
 class MealPlanSerializer(serializers.ModelSerializer):
     meal_type = MealTypeSerializer(read_only=True)
@@ -117,7 +262,7 @@ class MealPlanSerializer(serializers.ModelSerializer):
         model = MealPlan
         fields = [
             'id', 'user', 'recipe', 'recipe_id',
-            'meal_type', 'meal_type_id', 'scheduled_time'
+            'meal_type', 'meal_type_id', 'scheduled_time', 'servings', 'updated_at'
         ]
         read_only_fields = ['user', 'recipe', 'meal_type']
 
@@ -129,7 +274,7 @@ class MealPlanSerializer(serializers.ModelSerializer):
 class ShoppingListItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingListItem
-        fields = ['id', 'name', 'amount', 'unit', 'checked']
+        fields = ['id', 'name', 'amount', 'unit', 'checked', 'updated_at']
 
 # RECIPE RATING
 class RecipeRatingSerializer(serializers.ModelSerializer):
@@ -137,3 +282,8 @@ class RecipeRatingSerializer(serializers.ModelSerializer):
         model = RecipeRating
         fields = ['id', 'user', 'recipe', 'rating', 'comment', 'created']
         read_only_fields = ['user', 'recipe', 'created']
+
+    def validate_rating(self, value):
+        if not 1 <= value <= 5:
+            raise serializers.ValidationError("Rating must be between 1 and 5.")
+        return value
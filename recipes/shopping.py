@@ -0,0 +1,167 @@
+"""
+Merging recipe ingredients into a user's shopping list.
+
+Amounts are parsed into numbers and units folded onto a base unit (g, ml, tsp)
+so that "500 g" + "1 kg" becomes "1.5 kg" instead of a growing "500 + 1" string.
+Everything is read in two queries and written with one bulk_create and one
+bulk_update, however many recipes and ingredients are merged.
+"""
+import re
+from decimal import Decimal, localcontext
+from fractions import Fraction
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import sync
+from .models import Ingredient, IngredientName, MealPlan, ShoppingListItem
+
+# alias -> (base unit, factor to base)
+UNITS = {
+    'g': ('g', 1), 'gr': ('g', 1), 'gram': ('g', 1), 'grams': ('g', 1),
+    'kg': ('g', 1000), 'kilogram': ('g', 1000), 'kilograms': ('g', 1000),
+    'ml': ('ml', 1), 'milliliter': ('ml', 1), 'milliliters': ('ml', 1),
+    'millilitre': ('ml', 1), 'millilitres': ('ml', 1),
+    'l': ('ml', 1000), 'liter': ('ml', 1000), 'liters': ('ml', 1000),
+    'litre': ('ml', 1000), 'litres': ('ml', 1000),
+    'tsp': ('tsp', 1), 'teaspoon': ('tsp', 1), 'teaspoons': ('tsp', 1),
+    'tbsp': ('tsp', 3), 'tablespoon': ('tsp', 3), 'tablespoons': ('tsp', 3),
+}
+
+# base unit -> (larger unit, factor) used when the total reaches it
+_DISPLAY = {'g': ('kg', 1000), 'ml': ('l', 1000), 'tsp': ('tbsp', 3)}
+
+# Largest servings multiplier accepted by the add-to-shopping-list endpoints
+MAX_MULTIPLIER = 100
+
+_NUMBER_RE = re.compile(r'^\s*(?:(\d+)\s+)?(\d+(?:[.,]\d+)?)(?:\s*/\s*(\d+))?\s*$')
+
+
+def parse_amount(text):
+    """
+    Parse "2", "1.5", "1/2", "1 1/2" or a legacy "2 + 3" sum into a Fraction.
+    Returns None for amounts that are not numbers ("a pinch", "to taste").
+    """
+    total = Fraction(0)
+    parts = str(text or '').split('+')
+    for part in parts:
+        match = _NUMBER_RE.match(part)
+        if not match:
+            return None
+        whole, number, denominator = match.groups()
+        value = Fraction(number.replace(',', '.'))
+        if denominator:
+            if int(denominator) == 0:
+                return None
+            value /= int(denominator)
+        if whole:
+            value += int(whole)
+        total += value
+    return total
+
+
+def normalize_unit(unit):
+    """Return ``(unit key, factor)``; unknown units are kept as-is with factor 1."""
+    unit = (unit or '').strip()
+    base = UNITS.get(unit.lower().rstrip('.'))
+    if base:
+        return base
+    return unit.lower(), 1
+
+
+def format_amount(value, base_unit):
+    """Render a base-unit amount, switching to the larger unit when it reads better."""
+    unit = base_unit
+    larger = _DISPLAY.get(base_unit)
+    if larger and value >= larger[1] and (base_unit != 'tsp' or value % larger[1] == 0):
+        unit, value = larger[0], value / larger[1]
+    with localcontext() as context:
+        # Enough digits for the whole part plus two decimals, however large it is
+        context.prec = max(context.prec, len(str(value.numerator // value.denominator)) + 3)
+        number = Decimal(value.numerator) / Decimal(value.denominator)
+        number = number.quantize(Decimal('0.01')).normalize()
+    return f'{number:f}', unit
+
+
+def _key(name, unit):
+    return IngredientName.normalize(name), normalize_unit(unit)[0]
+
+
+@transaction.atomic
+def add_recipes(user, recipes):
+    """
+    Merge the ingredients of ``recipes`` into ``user``'s shopping list.
+
+    ``recipes`` is an iterable of ``(recipe_id, multiplier)`` pairs; each
+    recipe's amounts are multiplied before merging. Returns
+    ``{'created': n, 'updated': n}``.
+    """
+    multipliers = {}
+    for recipe_id, multiplier in recipes:
+        multipliers[recipe_id] = multipliers.get(recipe_id, 0) + Fraction(str(multiplier))
+
+    items = {}
+    for item in ShoppingListItem.objects.filter(user=user):
+        items.setdefault(_key(item.name, item.unit), item)
+    # base-unit totals of the items we touch; None when the amount is not numeric
+    totals = {}
+    created, updated = {}, {}
+
+    ingredients = Ingredient.objects.filter(recipe_id__in=multipliers).values_list(
+        'recipe_id', 'name', 'amount', 'unit'
+    )
+    for recipe_id, name, amount, unit in ingredients:
+        key = _key(name, unit)
+        factor = normalize_unit(unit)[1]
+        value = parse_amount(amount)
+        if value is not None:
+            value = value * factor * multipliers[recipe_id]
+
+        item = items.get(key)
+        if item is None:
+            item = items[key] = created[key] = ShoppingListItem(
+                user=user, name=name, unit=unit or '', amount=amount, checked=False
+            )
+            totals[key] = value
+        else:
+            if key not in totals:
+                current = parse_amount(item.amount)
+                totals[key] = None if current is None else current * normalize_unit(item.unit)[1]
+            # Non-numeric amounts are not accumulated: the item is already on the list
+            if totals[key] is None or value is None:
+                continue
+            totals[key] += value
+            if key not in created:
+                updated[key] = item
+
+    for key, item in {**created, **updated}.items():
+        if totals[key] is not None:
+            item.amount, unit = format_amount(totals[key], key[1])
+            if key[1] in _DISPLAY:
+                item.unit = unit
+
+    now = timezone.now()
+    if created:
+        ShoppingListItem.objects.bulk_create(created.values())
+    if updated:
+        for item in updated.values():
+            item.updated_at = now
+        # bulk_update() skips auto_now
+        ShoppingListItem.objects.bulk_update(updated.values(), ['amount', 'unit', 'updated_at'])
+    # Bulk writes send no post_save (see recipes.signals)
+    sync.guard_commit_lag(ShoppingListItem, [item.pk for item in {**created, **updated}.values()], now)
+    return {'created': len(created), 'updated': len(updated)}
+
+
+def planned_recipes(user, start, end):
+    """
+    ``(recipe_id, multiplier)`` for every MealPlan of ``user`` scheduled in
+    ``[start, end)``, scaled from the recipe's servings to the planned ones.
+    """
+    plans = MealPlan.objects.filter(
+        user=user, scheduled_time__gte=start, scheduled_time__lt=end
+    ).values_list('recipe_id', 'servings', 'recipe__servings')
+    return [
+        (recipe_id, Fraction(planned, base) if planned and base else 1)
+        for recipe_id, planned, base in plans
+    ]
@@ -0,0 +1,235 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import autocomplete, caching, images, pantry, ratings, search, sync
+from .models import (
+    Category, MealType, Recipe, RecipeRating, Ingredient, IngredientName, Instruction, MealPlan, ShoppingListItem,
+    Deletion,
+)
+
+
+# --- Batched refreshes for bulk writes ---
+_batch = contextvars.ContextVar('recipes_ingredient_batch', default=None)
+
+
+def ingredients_changed(recipe_ids):
+    """Refresh everything derived from ingredients."""
+    batch = _batch.get()
+    if batch is not None:
+        batch.update(recipe_ids)
+        return
+    search.reindex(recipe_ids)
+    caching.invalidate('recipes', recipe_ids)
+    pantry.invalidate()
+    autocomplete.invalidate()
+    sync.touch(recipe_ids)
+
+
+def _reindex(recipe_ids, touch=True):
+    # touch=False when the recipe row itself was just saved (or deleted)
+    batch = _batch.get()
+    if batch is not None:
+        batch.update(recipe_ids)
+    else:
+        recipe_ids = list(recipe_ids)
+        search.reindex(recipe_ids)
+        caching.invalidate('recipes', recipe_ids)
+        if touch:
+            sync.touch(recipe_ids)
+
+
+@contextmanager
+def ingredient_batch():
+    """
+    Collect ingredient changes made inside the block and refresh the derived
+    indexes once at the end. Bulk writes send no signals, so add their recipe
+    ids to the yielded set yourself.
+    """
+    touched = set()
+    token = _batch.set(touched)
+    try:
+        yield touched
+    finally:
+        _batch.reset(token)
+    if touched:
+        ingredients_changed(touched)
+
+
+# --- Recipe deletions ---
+_deleting = contextvars.ContextVar('recipes_deleting', default=frozenset())
+
+
+@contextmanager
+def recipe_deletion(recipe_ids):
+    """
+    Delete recipes inside the block (see Recipe.delete and RecipeQuerySet.delete).
+    The ingredients, instructions and ratings cascaded with them send no
+    refreshes of their own; everything derived from the recipes is refreshed
+    once at the end instead.
+    """
+    recipe_ids = frozenset(recipe_ids)
+    token = _deleting.set(_deleting.get() | recipe_ids)
+    try:
+        yield
+    finally:
+        _deleting.reset(token)
+    search.reindex(recipe_ids)
+    caching.invalidate('recipes', recipe_ids)
+    pantry.invalidate()
+    autocomplete.invalidate()
+
+
+def _deleted_with_recipe(instance):
+    return instance.recipe_id in _deleting.get()
+
+
+# --- Keep the search, pantry and autocomplete indexes (and cached responses) in sync ---
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def index_ingredient_recipe(sender, instance, raw=False, **kwargs):
+    if not raw and not _deleted_with_recipe(instance):
+        ingredients_changed([instance.recipe_id])
+
+
+@receiver(post_save, sender=IngredientName)
+@receiver(post_delete, sender=IngredientName)
+def refresh_autocomplete(sender, raw=False, **kwargs):
+    if not raw:
+        autocomplete.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _reindex([instance.pk], touch=False)
+
+
+@receiver(post_save, sender=Recipe)
+def queue_image_variants(sender, instance, raw=False, **kwargs):
+    # The in-memory image_variants may be stale; images.generate() re-checks the row
+    if not raw and instance.image and instance.image_variants.get('source') != instance.image.name:
+        images.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    if instance.pk not in _deleting.get():
+        _reindex([instance.pk], touch=False)
+
+
+@receiver(m2m_changed, sender=Recipe.categories.through)
+def index_recipe_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            _reindex([instance.pk])
+    elif action == 'pre_clear':
+        # The affected recipes are only known before the links are removed
+        instance._cleared_recipe_ids = list(instance.recipes.values_list('id', flat=True))
+    elif action == 'post_clear':
+        _reindex(getattr(instance, '_cleared_recipe_ids', []))
+    else:
+        _reindex(pk_set)
+
+
+@receiver(post_save, sender=Category)
+def index_category_recipes(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    caching.invalidate('categories', [instance.pk])
+    if not created:
+        _reindex(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_recipes(sender, instance, **kwargs):
+    # Link rows are cascaded without m2m_changed, so collect the recipes first
+    instance._deleted_recipe_ids = list(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def index_deleted_category_recipes(sender, instance, **kwargs):
+    caching.invalidate('categories', [instance.pk])
+    _reindex(getattr(instance, '_deleted_recipe_ids', []))
+
+
+# --- Expire cached API responses ---
+@receiver(post_save, sender=Instruction)
+@receiver(post_delete, sender=Instruction)
+def expire_instruction_recipe(sender, instance, raw=False, **kwargs):
+    if raw or _deleted_with_recipe(instance):
+        return
+    batch = _batch.get()
+    if batch is not None:
+        batch.add(instance.recipe_id)
+    else:
+        caching.invalidate('recipes', [instance.recipe_id])
+        sync.touch([instance.recipe_id])
+
+
+@receiver(post_save, sender=MealType)
+@receiver(post_delete, sender=MealType)
+def expire_meal_type(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate('mealtypes', [instance.pk])
+
+
+
+# --- Recipe rating aggregates ---
+@receiver(post_save, sender=RecipeRating)
+def count_rating(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    counted = getattr(instance, '_counted', None)
+    if created:
+        ratings.apply_delta(instance.recipe_id, 1, instance.rating)
+    elif counted is None:
+        # Saved from an instance that wasn't loaded from the database: old value unknown
+        ratings.rebuild(Recipe.objects.filter(pk=instance.recipe_id))
+        sync.touch([instance.recipe_id])
+    elif counted[0] != instance.recipe_id:
+        ratings.apply_delta(counted[0], -1, -counted[1])
+        ratings.apply_delta(instance.recipe_id, 1, instance.rating)
+        caching.invalidate('recipes', [counted[0]])
+    elif counted[1] != instance.rating:
+        ratings.apply_delta(instance.recipe_id, 0, instance.rating - counted[1])
+    instance._counted = (instance.recipe_id, instance.rating)
+    caching.invalidate('recipes', [instance.recipe_id])
+
+
+@receiver(post_delete, sender=RecipeRating)
+def uncount_rating(sender, instance, **kwargs):
+    if _deleted_with_recipe(instance):
+        return
+    recipe_id, rating = getattr(instance, '_counted', None) or (instance.recipe_id, instance.rating)
+    ratings.apply_delta(recipe_id, -1, -rating)
+    caching.invalidate('recipes', [recipe_id])
+
+
+# --- Changes and deletions reported by /api/sync/ ---
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=MealPlan)
+@receiver(post_save, sender=ShoppingListItem)
+def guard_sync_commit_lag(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync.guard_commit_lag(sender, [instance.pk], instance.updated_at)
+
+
+
+@receiver(post_delete, sender=Recipe)
+def record_recipe_deletion(sender, instance, **kwargs):
+    sync.record_deletion(Deletion.RECIPE, instance.pk)
+
+
+@receiver(post_delete, sender=MealPlan)
+def record_meal_plan_deletion(sender, instance, **kwargs):
+    sync.record_deletion(Deletion.MEAL_PLAN, instance.pk, instance.user_id)
+
+
+@receiver(post_delete, sender=ShoppingListItem)
+def record_shopping_list_item_deletion(sender, instance, **kwargs):
+    sync.record_deletion(Deletion.SHOPPING_LIST_ITEM, instance.pk, instance.user_id)
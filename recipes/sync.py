@@ -0,0 +1,194 @@
+"""
+Change tracking for incremental client sync (``/api/sync/``).
+
+Recipes, meal plans and shopping list items have an indexed ``updated_at``.
+A recipe is also touched when its ingredients, instructions, category links,
+rating aggregates or image variants change (see recipes.signals), since all of
+them are part of its representation. Deleted rows are recorded as
+``Deletion`` rows.
+
+A sync cycle covers the changes made between the end of the previous cycle and
+the time the cycle starts (``until``), and is read in pages: each collection
+is walked along its ``(updated_at, id)`` index, at most ``limit`` rows per page,
+and the token of a page carries where every collection stopped. The cost of a
+page therefore follows the page size, and a whole cycle the amount of change,
+never the amount of data. A token is signed, so clients can't forge cursors.
+
+``updated_at`` is set by the app server before its transaction commits, so a
+row can become visible after a cycle that should have included it was read.
+Each cycle therefore re-reads the ``SYNC_MAX_COMMIT_LAG`` seconds before its
+start (clients apply changes by id, so repeats are harmless), and
+``guard_commit_lag`` re-touches rows whose transaction committed later than
+that, moving them into the next cycle. App server clocks must agree within the
+same margin.
+
+Deletions are kept for ``SYNC_DELETION_RETENTION_DAYS``; a client with an
+older token (or none) gets everything with ``reset`` set.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import listing
+from .models import Deletion, MealPlan, Recipe, ShoppingListItem
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+PURGE_BATCH_SIZE = 1000
+TOKEN_SALT = 'recipes.sync'
+COLLECTIONS = ('recipes', 'meal_plans', 'shopping_list', 'deleted')
+DELETED_KEYS = {
+    Deletion.RECIPE: 'recipes', Deletion.MEAL_PLAN: 'meal_plans', Deletion.SHOPPING_LIST_ITEM: 'shopping_list',
+}
+
+
+def _commit_lag():
+    return timedelta(seconds=settings.SYNC_MAX_COMMIT_LAG)
+
+
+def guard_commit_lag(model, pks, written_at, field='updated_at'):
+    """
+    Once the current transaction commits, touch ``pks`` again if it committed
+    more than ``SYNC_MAX_COMMIT_LAG`` after ``written_at`` (the value written to
+    their ``field``), since a sync may have read past them in the meantime.
+    """
+    pks = list(pks)
+
+    def check():
+        if pks and timezone.now() - written_at > _commit_lag():
+            logger.warning("%s %s committed late; touching them again for sync", model.__name__, pks)
+            model.objects.filter(pk__in=pks).update(**{field: timezone.now()})
+
+    transaction.on_commit(check)
+
+
+def touch(recipe_ids):
+    """Mark recipes as changed whose children were written without saving the recipe itself."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        now = timezone.now()
+        Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=now)
+        guard_commit_lag(Recipe, recipe_ids, now)
+
+
+def record_deletion(kind, object_id, user_id=None):
+    deletion = Deletion.objects.create(kind=kind, object_id=object_id, user_id=user_id)
+    guard_commit_lag(Deletion, [deletion.pk], deletion.deleted_at, field='deleted_at')
+
+
+# --- Tokens ---
+def _encode(state):
+    return signing.dumps(state, salt=TOKEN_SALT, compress=True)
+
+
+def token_since(moment):
+    """The token of a sync cycle covering the changes made after ``moment``."""
+    return _encode({'since': moment.isoformat()})
+
+
+def parse_token(token):
+    """The sync state a token stands for, or None if it isn't a valid token."""
+    try:
+        state = signing.loads(token, salt=TOKEN_SALT)
+        for key in ('since', 'until'):
+            if state.get(key) is not None:
+                state[key] = datetime.fromisoformat(state[key])
+    except (signing.BadSignature, AttributeError, TypeError, ValueError):
+        return None
+    return state
+
+
+def _cursor(row, field='updated_at'):
+    value = row[field] if isinstance(row, dict) else getattr(row, field)
+    pk = row['id'] if isinstance(row, dict) else row.pk
+    return [value.isoformat(), pk]
+
+
+def _after(queryset, cursor, field='updated_at'):
+    if cursor is None:
+        return queryset
+    value, pk = datetime.fromisoformat(cursor[0]), cursor[1]
+    return queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+
+
+# --- Reading changes ---
+def page(user, state=None, limit=PAGE_SIZE):
+    """
+    One page of what changed for ``user``. ``state`` is a parsed token (None
+    for a first sync). Returns the recipe rows (``recipes.listing`` values),
+    meal plan and shopping list item instances, deleted ids per collection,
+    ``has_more`` and the token for the next request.
+    """
+    now = timezone.now()
+    state = dict(state or {})
+    if 'until' not in state:
+        # First page of a cycle
+        since = state.get('since')
+        reset = since is None or since < now - timedelta(days=settings.SYNC_DELETION_RETENTION_DAYS)
+        state = {'since': None if reset else since, 'until': now, 'cursors': {}}
+    else:
+        reset = False
+    since, until, cursors = state['since'], state['until'], state['cursors']
+
+    def changed(queryset, field='updated_at'):
+        queryset = queryset.filter(**{f'{field}__lt': until})
+        if since is not None:
+            queryset = queryset.filter(**{f'{field}__gte': since - _commit_lag()})
+        return queryset.order_by(field, 'id')
+
+    querysets = {
+        'recipes': listing.row_queryset(changed(Recipe.objects.all())),
+        'meal_plans': changed(MealPlan.objects.filter(user=user)).with_details(),
+        'shopping_list': changed(ShoppingListItem.objects.filter(user=user)),
+        'deleted': (
+            changed(Deletion.objects.filter(Q(user=None) | Q(user=user)), 'deleted_at')
+            if since is not None else Deletion.objects.none()
+        ),
+    }
+    result = {name: [] for name in COLLECTIONS}
+    next_cursors = {}
+    for name, queryset in querysets.items():
+        cursor = cursors.get(name)
+        if cursor == 'done':
+            next_cursors[name] = 'done'
+            continue
+        field = 'deleted_at' if name == 'deleted' else 'updated_at'
+        rows = list(_after(queryset, cursor, field)[:limit + 1])
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursors[name] = _cursor(rows[-1], field)
+        else:
+            next_cursors[name] = 'done'
+        result[name] = rows
+
+    deleted = {key: [] for key in DELETED_KEYS.values()}
+    for row in result.pop('deleted'):
+        deleted[DELETED_KEYS[row.kind]].append(row.object_id)
+
+    has_more = any(cursor != 'done' for cursor in next_cursors.values())
+    if has_more:
+        token = _encode({'since': since and since.isoformat(), 'until': until.isoformat(), 'cursors': next_cursors})
+    else:
+        # The next cycle starts where this one ended
+        token = token_since(until)
+    return {**result, 'deleted': deleted, 'reset': reset, 'has_more': has_more, 'token': token}
+
+
+def purge(batch_size=PURGE_BATCH_SIZE):
+    """Delete deletion records past the retention period; returns how many were deleted."""
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_DELETION_RETENTION_DAYS)
+    deleted = 0
+    while True:
+        batch = list(Deletion.objects.filter(deleted_at__lt=cutoff).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += Deletion.objects.filter(pk__in=batch).delete()[0]
+        if len(batch) < batch_size:
+            return deleted
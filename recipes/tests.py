@@ -1,3 +1,1074 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from PIL import Image
+from rest_framework.test import APIClient
+
+
+from .models import (
+    Category, Deletion, MealType, Recipe, RecipeRating, Ingredient, IngredientName, Instruction, MealPlan,
+    ShoppingListItem
+)
+from . import images, listing, ratings, search, shopping, sync
+from .memindex import LazyIndex
+from .serializers import RecipeSerializer
+from .views import RecipeViewSet
+
+User = get_user_model()
+
+
+def make_recipe(name='Omelette', categories=(), ingredients=('egg', 'milk'), steps=2):
+    recipe = Recipe.objects.create(
+        name=name, description='Tasty', prep_time=5, cook_time=10, servings=2
+    )
+    if categories:
+        recipe.categories.set(categories)
+    for ing in ingredients:
+        Ingredient.objects.create(recipe=recipe, name=ing, amount='1', unit='pcs')
+    for n in range(1, steps + 1):
+        Instruction.objects.create(recipe=recipe, step_number=n, description=f'Step {n}')
+    return recipe
+
+
+class APITestBase(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('cook@example.com', 'Cook', 'Book', 'Secret123')
+        self.breakfast = Category.objects.create(name='Breakfast')
+        self.dinner = Category.objects.create(name='Dinner')
+
+
+# --- Query budgets: must not grow with the number of rows returned ---
+class RecipeQueryBudgetTests(APITestBase):
+    # recipes + categories + ingredients + instructions
+    RECIPE_QUERIES = 4
+
+    def test_list_is_constant(self):
+        for i in range(10):
+            make_recipe(f'Recipe {i}', categories=[self.breakfast, self.dinner])
+        with self.assertNumQueries(self.RECIPE_QUERIES):
+            response = self.client.get(reverse('recipe-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 10)
+        self.assertEqual(len(response.json()['results'][0]['ingredients']), 2)
+
+    def test_list_with_ingredient_filter_is_constant(self):
+        for i in range(5):
+            make_recipe(f'Recipe {i}', ingredients=('egg', 'milk', 'flour'))
+        make_recipe('Salad', ingredients=('lettuce',))
+        with self.assertNumQueries(self.RECIPE_QUERIES):
+            response = self.client.get(reverse('recipe-list'), {'ingredients': 'egg,flour'})
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_detail(self):
+        recipe = make_recipe(categories=[self.breakfast])
+        with self.assertNumQueries(self.RECIPE_QUERIES):
+            response = self.client.get(reverse('recipe-detail', args=[recipe.id]))
+        self.assertEqual(response.json()['categories'], [{'id': self.breakfast.id, 'name': 'Breakfast'}])
+        self.assertEqual([s['step_number'] for s in response.json()['instructions']], [1, 2])
+
+
+    def test_destroy_is_constant(self):
+        self.client.force_authenticate(self.user)
+        for size in (2, 15):
+            recipe = make_recipe(f'Recipe {size}', categories=[self.breakfast],
+                                 ingredients=[f'item {n}' for n in range(size)], steps=size)
+            RecipeRating.objects.create(recipe=recipe, user=self.user, rating=4)
+            # the recipe, its ingredients, instructions, meal plans and ratings (loaded for
+            # their signals, then deleted), category links, the recipe row, the deletion
+            # record and one search reindex, whatever the number of children
+            with self.assertNumQueries(14):
+                response = self.client.delete(reverse('recipe-detail', args=[recipe.id]))
+            self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(reverse('recipe-list'), {'search': 'item'}).json()['results'], [])
+        self.assertEqual(self.client.get(reverse('ingredient-list'), {'search': 'item'}).json(), [])
+
+
+class MealPlanQueryBudgetTests(APITestBase):
+    def test_list_is_constant(self):
+        lunch = MealType.objects.create(name='Lunch')
+        now = timezone.now()
+        for i in range(8):
+            recipe = make_recipe(f'Recipe {i}', categories=[self.dinner])
+            MealPlan.objects.create(
+                user=self.user, recipe=recipe, meal_type=lunch,
+                scheduled_time=now + timedelta(days=i)
+            )
+        self.client.force_authenticate(self.user)
+        # meal plans (+ meal type) + recipes + categories + ingredients + instructions
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('mealplan-list'))
+        results = response.data['results']
+        self.assertEqual(len(results), 8)
+        self.assertEqual(results[0]['meal_type']['name'], 'Lunch')
+        self.assertEqual(len(results[0]['recipe']['instructions']), 2)
+
+
+class RecipeSearchTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.omelette = make_recipe('Cheese Omelette', categories=[self.breakfast], ingredients=('eggs', 'milk'))
+        self.pancakes = make_recipe('Pancakes', categories=[self.breakfast], ingredients=('egg', 'milk', 'flour'))
+        self.stew = make_recipe('Beef Stew', categories=[self.dinner], ingredients=('beef', 'carrot'))
+
+    def ids(self, **params):
+        response = self.client.get(reverse('recipe-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [r['id'] for r in response.json()['results']]
+
+    def test_ingredients_and_search(self):
+        self.assertEqual(self.ids(ingredients='egg,flour'), [self.pancakes.id])
+        self.assertCountEqual(self.ids(ingredients='egg, milk'), [self.omelette.id, self.pancakes.id])
+        self.assertEqual(self.ids(ingredients='egg,beef'), [])
+
+    def test_search_matches_name_category_and_ingredient(self):
+        self.assertEqual(self.ids(search='omel'), [self.omelette.id])
+        self.assertEqual(self.ids(search='dinner'), [self.stew.id])
+        self.assertEqual(self.ids(search='carrot'), [self.stew.id])
+        self.assertEqual(self.ids(search='"; DROP TABLE'), [])
+
+    def test_name_match_ranks_first(self):
+        flour_cake = make_recipe('Flour Cake', ingredients=('sugar',))
+        self.assertEqual(self.ids(search='flour'), [flour_cake.id, self.pancakes.id])
+
+    def test_index_follows_changes(self):
+        Ingredient.objects.create(recipe=self.stew, name='Flour', amount='1', unit='tbsp')
+        self.assertCountEqual(self.ids(ingredients='flour'), [self.pancakes.id, self.stew.id])
+        self.stew.ingredients.filter(name='Flour').delete()
+        self.assertEqual(self.ids(ingredients='flour'), [self.pancakes.id])
+
+        self.dinner.name = 'Supper'
+        self.dinner.save()
+        self.assertEqual(self.ids(search='supper'), [self.stew.id])
+        self.stew.categories.clear()
+        self.assertEqual(self.ids(search='supper'), [])
+
+        self.breakfast.delete()
+        self.assertEqual(self.ids(search='breakfast'), [])
+        self.pancakes.delete()
+        self.assertEqual(self.ids(ingredients='egg'), [self.omelette.id])
+
+    def test_rebuild_is_all_or_nothing(self):
+        reindex, batches = search.reindex, []
+
+        def crash_on_second_batch(ids):
+            batches.append(ids)
+            if len(batches) == 2:
+                raise RuntimeError('crashed')
+            reindex(ids)
+
+        with mock.patch('recipes.search.reindex', side_effect=crash_on_second_batch), \
+                self.assertRaises(RuntimeError):
+            search.rebuild(batch_size=2)
+        # The old index is still complete
+        self.assertCountEqual(self.ids(ingredients='egg'), [self.omelette.id, self.pancakes.id])
+        self.assertEqual(self.ids(search='stew'), [self.stew.id])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.ids(search='stew'), [self.stew.id])
+
+
+class IngredientCatalogTests(APITestBase):
+    def test_names_are_normalized_and_shared(self):
+        a = make_recipe('A', ingredients=('Olive  Oil', 'egg'))
+        b = make_recipe('B', ingredients=('olive oil',))
+        self.assertEqual(IngredientName.objects.filter(name='olive oil').count(), 1)
+        self.assertEqual(
+            a.ingredients.get(name='Olive  Oil').catalog_id, b.ingredients.get().catalog_id
+        )
+
+    def test_catalog_is_looked_up_only_when_the_name_changes(self):
+        recipe = make_recipe('A', ingredients=('egg',))
+        ingredient = Ingredient.objects.get(recipe=recipe)
+
+        def catalog_queries():
+            return [q for q in ctx.captured_queries if 'recipes_ingredientname' in q['sql']]
+
+        with CaptureQueriesContext(connection) as ctx:
+            ingredient.amount = '2'
+            ingredient.save()
+        self.assertEqual(catalog_queries(), [])
+        with CaptureQueriesContext(connection) as ctx:
+            ingredient.name = 'Eggs'
+            ingredient.save()
+        self.assertEqual(len(catalog_queries()), 3)  # a new name: look up, insert, read back
+        self.assertEqual(ingredient.catalog.name, 'eggs')
+
+
+class CookableTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.omelette = make_recipe('Omelette', ingredients=('egg', 'milk'))
+        self.pancakes = make_recipe('Pancakes', ingredients=('egg', 'milk', 'flour'))
+        self.cake = make_recipe('Cake', ingredients=('egg', 'flour', 'sugar', 'butter'))
+        make_recipe('Stew', ingredients=('beef', 'carrot'))
+        self.catalog = dict(IngredientName.objects.values_list('name', 'id'))
+
+    def cookable(self, *names, **params):
+        ids = ','.join(str(self.catalog[n]) for n in names)
+        return self.client.get(reverse('recipe-cookable'), {'ingredient_ids': ids, **params})
+
+    def test_ranked_by_coverage(self):
+        response = self.cookable('egg', 'milk', 'flour')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(r['name'], r['matched_ingredients'], r['missing_ingredients']) for r in response.data],
+            [('Pancakes', 3, 0), ('Omelette', 2, 0), ('Cake', 2, 2)]
+        )
+        self.assertEqual([r['name'] for r in self.cookable('egg', limit=1).data], ['Omelette'])
+
+    def test_index_refreshes_and_answers_without_rebuilding(self):
+        self.cookable('egg')
+        # index is warm: only the recipe page itself is loaded
+        with self.assertNumQueries(4):
+            self.cookable('egg')
+        Ingredient.objects.create(recipe=self.cake, name='Milk', amount='1', unit='cup')
+        response = self.cookable('egg', 'milk', 'flour')
+        self.assertEqual(response.data[2]['missing_ingredients'], 2)
+        self.assertEqual(response.data[2]['matched_ingredients'], 3)
+
+    def test_index_version_expires(self):
+        # Without a shared cache, other workers' changes show up once the stamp expires
+        builds = []
+        index = LazyIndex('recipes:test-index-version', lambda: builds.append(None) or len(builds))
+        self.assertEqual((index.get(), index.get()), (1, 1))
+        expired = time.time() + settings.INDEX_VERSION_TTL + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=expired):
+            self.assertEqual(index.get(), 2)
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get(reverse('recipe-cookable')).status_code, 400)
+        self.assertEqual(self.client.get(reverse('recipe-cookable'), {'ingredient_ids': 'x'}).status_code, 400)
+
+
+class IngredientAutocompleteTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        make_recipe('A', ingredients=('Olive Oil', 'onion'))
+        make_recipe('B', ingredients=('olive oil', 'oil'))
+        make_recipe('C', ingredients=('olive oil', 'oregano'))
+        make_recipe('D', ingredients=('onion',))
+
+    def names(self, **params):
+        response = self.client.get(reverse('ingredient-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [(i['name'], i['recipe_count']) for i in response.data]
+
+    def test_prefix_first_then_usage(self):
+        self.assertEqual(self.names(search='O'), [('olive oil', 3), ('onion', 2), ('oil', 1), ('oregano', 1)])
+        self.assertEqual(self.names(search='oil'), [('oil', 1), ('olive oil', 3)])
+        self.assertEqual(self.names(search='on', limit=1), [('onion', 2)])
+        self.assertEqual(self.names(search='xyz'), [])
+
+    def test_served_from_memory_and_refreshed(self):
+        self.names(search='o')
+        with self.assertNumQueries(0):
+            self.names(search='on')
+        make_recipe('E', ingredients=('Oregano',))
+        self.assertEqual(self.names(search='ore'), [('oregano', 2)])
+
+
+class RecipeWriteTests(APITestBase):
+    def payload(self, ingredients, steps):
+        return {
+            'name': 'Bread', 'description': 'Loaf', 'prep_time': 20, 'cook_time': 40, 'servings': 8,
+            'category_ids': [self.breakfast.id],
+            'ingredients': [{'name': n, 'amount': a, 'unit': 'g'} for n, a in ingredients],
+            'instructions': [{'step_number': i, 'description': d} for i, d in enumerate(steps, 1)],
+        }
+
+    def test_create_does_not_scale_with_children(self):
+        self.client.force_authenticate(self.user)
+        ingredients = [(f'item {i}', '1') for i in range(30)]
+        steps = [f'Step {i}' for i in range(30)]
+        with self.assertNumQueries(21):
+            response = self.client.post(reverse('recipe-list'), self.payload(ingredients, steps), format='json')
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.ingredients.count(), 30)
+        self.assertEqual(recipe.ingredients.filter(catalog__isnull=True).count(), 0)
+        self.assertEqual(recipe.instructions.count(), 30)
+        self.assertEqual(self.client.get(reverse('recipe-list'), {'ingredients': 'item'}).data['results'][0]['id'], recipe.id)
+
+    def test_update_only_touches_changed_rows(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse('recipe-list'),
+            self.payload([('flour', '500'), ('water', '300'), ('salt', '10')], ['Mix', 'Bake']),
+            format='json'
+        )
+        recipe_id = response.data['id']
+        ids = {i['name']: i['id'] for i in response.data['ingredients']}
+        step_ids = [s['id'] for s in response.data['instructions']]
+
+        response = self.client.put(
+            reverse('recipe-detail', args=[recipe_id]),
+            self.payload([('flour', '500'), ('water', '350'), ('yeast', '7')], ['Mix', 'Bake']),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        # water updated, salt deleted, yeast created; instructions untouched
+        self.assertEqual(response['X-Rows-Touched'], '3')
+        new_ids = {i['name']: i['id'] for i in response.data['ingredients']}
+        self.assertEqual(new_ids['flour'], ids['flour'])
+        self.assertEqual(new_ids['water'], ids['water'])
+        self.assertNotIn('salt', new_ids)
+        self.assertEqual([s['id'] for s in response.data['instructions']], step_ids)
+        self.assertEqual(self.client.get(reverse('recipe-list'), {'ingredients': 'salt'}).data['results'], [])
+        self.assertEqual(len(self.client.get(reverse('recipe-list'), {'ingredients': 'yeast'}).data['results']), 1)
+
+
+class ShoppingListMergeTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.bread = Recipe.objects.create(name='Bread', description='', prep_time=1, cook_time=1, servings=1)
+        self.cake = Recipe.objects.create(name='Cake', description='', prep_time=1, cook_time=1, servings=1)
+        for recipe, rows in (
+            (self.bread, [('Flour', '600', 'g'), ('Salt', '1', 'tsp'), ('Water', '0.4', 'l')]),
+            (self.cake, [('flour', '0.5', 'kg'), ('salt', '1/2', 'tbsp'), ('Vanilla', 'a pinch', None)]),
+        ):
+            for name, amount, unit in rows:
+                Ingredient.objects.create(recipe=recipe, name=name, amount=amount, unit=unit)
+
+    def shopping_list(self):
+        return {i.name.lower(): (i.amount, i.unit) for i in self.user.shopping_list.all()}
+
+    def test_merges_numerically_with_units(self):
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                reverse('shoppinglist-add-recipe-ingredients'),
+                {'recipe_ids': [self.bread.id, self.cake.id]}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(self.shopping_list(), {
+            'flour': ('1.1', 'kg'), 'salt': ('2.5', 'tsp'), 'water': ('400', 'ml'), 'vanilla': ('a pinch', ''),
+        })
+
+    def test_repeated_adds_stay_bounded_and_scale(self):
+        url = reverse('recipe-add-recipe-ingredients')
+        self.client.post(url, {'recipe_id': self.cake.id}, format='json')
+        response = self.client.post(url, {'recipe_id': self.cake.id, 'servings_multiplier': 3}, format='json')
+        self.assertEqual(response.data, {'status': 'Ingredients added to shopping list', 'created': 0, 'updated': 2})
+        self.assertEqual(self.shopping_list(), {
+            'flour': ('2', 'kg'), 'salt': ('2', 'tbsp'), 'vanilla': ('a pinch', ''),
+        })
+
+    def test_legacy_sum_strings_are_folded(self):
+        ShoppingListItem.objects.create(user=self.user, name='Flour', amount='100 + 200', unit='g')
+        self.client.post(reverse('recipe-add-recipe-ingredients'), {'recipe_id': self.bread.id}, format='json')
+        self.assertEqual(self.shopping_list()['flour'], ('900', 'g'))
+
+    def test_errors(self):
+        url = reverse('shoppinglist-add-recipe-ingredients')
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'recipe_id': 999}, format='json').status_code, 404)
+        self.assertEqual(
+            self.client.post(url, {'recipe_id': self.bread.id, 'servings_multiplier': 0}, format='json').status_code,
+            400
+        )
+        for multiplier in ('1e40', '101', 'NaN'):
+            response = self.client.post(url, {'recipe_id': self.bread.id, 'servings_multiplier': multiplier},
+                                        format='json')
+            self.assertEqual(response.status_code, 400, multiplier)
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_huge_amounts_are_formatted(self):
+        Ingredient.objects.filter(recipe=self.bread, name='Flour').update(amount='9' * 60)
+        url = reverse('shoppinglist-add-recipe-ingredients')
+        response = self.client.post(url, {'recipe_id': self.bread.id, 'servings_multiplier': 100}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.shopping_list()['flour'], ('9' * 59 + '.9', 'kg'))
+
+    def test_from_meal_plan_scales_by_planned_servings(self):
+        self.bread.servings = 2
+        self.bread.save()
+        monday = timezone.make_aware(timezone.datetime(2026, 3, 2, 12))
+        for day, recipe, servings in ((0, self.bread, 4), (1, self.cake, None), (2, self.bread, None), (9, self.cake, 5)):
+            MealPlan.objects.create(
+                user=self.user, recipe=recipe, servings=servings, scheduled_time=monday + timedelta(days=day)
+            )
+        url = reverse('shoppinglist-from-meal-plan')
+        with self.assertNumQueries(6):
+            response = self.client.post(url, {'start_date': '2026-03-02', 'end_date': '2026-03-04'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # bread x2 + bread x1 + cake x1
+        self.assertEqual(self.shopping_list(), {
+            'flour': ('2.3', 'kg'), 'salt': ('4.5', 'tsp'), 'water': ('1.2', 'l'), 'vanilla': ('a pinch', ''),
+        })
+        self.assertEqual(self.client.post(url, {'start_date': '2026-03-04', 'end_date': '2026-03-02'}).status_code, 400)
+
+
+class RecipePaginationTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.recipes = [make_recipe(f'Soup {i}', ingredients=['water'] * (i % 3 + 1)) for i in range(7)]
+
+    def walk(self, params):
+        seen, url = [], reverse('recipe-list')
+        while url:
+            response = self.client.get(url, params)
+            seen += [r['id'] for r in response.json()['results']]
+            url, params = response.json()['next'], None
+        return seen
+
+    def test_cursor_pages_are_stable(self):
+        ids = self.walk({'page_size': 3})
+        self.assertEqual(ids, sorted((r.id for r in self.recipes), reverse=True))
+        ranked = self.walk({'page_size': 2, 'search': 'soup water'})
+        self.assertCountEqual(ranked, ids)
+        self.assertEqual(ranked[:3], self.walk({'page_size': 3, 'search': 'soup water'})[:3])
+
+    def test_summary_fields_skip_children(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('recipe-list'), {'fields': 'summary'})
+        self.assertEqual(set(response.json()['results'][0]), {
+            'id', 'name', 'image', 'image_variants', 'prep_time', 'cook_time', 'servings', 'healthy',
+            'calories', 'protein', 'fats', 'carbs', 'rating_count', 'avg_rating',
+        })
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('recipe-list'), {'fields': 'id,name', 'expand': 'ingredients'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'name', 'ingredients'})
+
+
+class RecipeListFastPathTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            recipe = make_recipe(f'Dish {i}', categories=[self.dinner, self.breakfast], ingredients=('rice', 'Salt'))
+            recipe.calories = 100 * i or None
+            recipe.healthy = bool(i % 2)
+            recipe.image = f'recipes/dish{i}.png' if i % 2 else None
+            recipe.save()
+
+    def assertSameAsSerializer(self, params):
+        response = self.client.get(reverse('recipe-list'), params)
+        request = response.wsgi_request
+        expected = RecipeSerializer(
+            Recipe.objects.with_details().order_by('-id'), many=True,
+            context={'request': Request(request)}
+        ).data
+        if 'fields' in params:
+            expected = [{k: v for k, v in r.items() if k in params['fields'].split(',')} for r in expected]
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render({'next': None, 'previous': None, 'results': expected})
+        )
+
+    def test_output_is_byte_identical(self):
+        self.assertSameAsSerializer({})
+        self.assertSameAsSerializer({'fields': 'id,image,categories'})
+
+    def test_renderer_matches_drf(self):
+        data = {'name': 'Plov\u2028\u2029 é 😀 "a\\b"\x01', 'avg_rating': 10 / 3, 'calories': None, 'tags': [1, True]}
+        fast, drf = listing.FastJSONRenderer(), JSONRenderer()
+        self.assertEqual(fast.render(data), drf.render(data))
+        self.assertEqual(fast.render(data, renderer_context={'indent': 2}), drf.render(data, renderer_context={'indent': 2}))
+
+    def test_ordering_on_unrequested_field(self):
+        response = self.client.get(reverse('recipe-list'), {'fields': 'name', 'ordering': '-calories'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Dish 3', 'Dish 2', 'Dish 1', 'Dish 0'])
+
+
+class RecipeExportStreamTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.recipes = [make_recipe(f'Dish {i}', categories=[self.dinner]) for i in range(5)]
+
+    def stream(self, params=None):
+        response = self.client.get(reverse('recipe-export'), params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_one_recipe_per_line_like_the_list(self):
+        listed = self.client.get(reverse('recipe-list')).json()['results']
+        self.assertEqual(self.stream(), listed[::-1])
+
+    @mock.patch('recipes.views.EXPORT_CHUNK_SIZE', 2)
+    def test_queries_per_chunk(self):
+        # The row cursor, then the three child tables once per chunk of two
+        with self.assertNumQueries(1 + 3 * 3):
+            self.assertEqual(len(self.stream()), 5)
+
+    def test_updated_since(self):
+        old = timezone.now() - timedelta(days=2)
+        Recipe.objects.filter(id__in=[r.id for r in self.recipes[:3]]).update(updated_at=old)
+        self.recipes[0].save()
+        since = (old + timedelta(days=1)).isoformat()
+        rows = self.stream({'updated_since': since, 'fields': 'name'})
+        self.assertEqual([r['name'] for r in rows], ['Dish 3', 'Dish 4', 'Dish 0'])
+        self.assertEqual(set(rows[0]), {'id', 'name', 'updated_at'})
+
+        response = self.client.get(reverse('recipe-export'), {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseCacheTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = make_recipe('Porridge', categories=[self.breakfast])
+
+    def test_hits_skip_the_database_and_honor_conditional_get(self):
+        url = reverse('recipe-detail', args=[self.recipe.id])
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertIn('Last-Modified', second)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=second['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_query_string_is_normalized(self):
+        self.client.get(reverse('recipe-list'), {'fields': 'id', 'healthy': 'false'})
+        with self.assertNumQueries(0):
+            self.client.get(reverse('recipe-list') + '?healthy=false&fields=id')
+
+    def test_changes_invalidate_list_and_detail(self):
+        detail = reverse('recipe-detail', args=[self.recipe.id])
+        etag = self.client.get(detail)['ETag']
+        self.client.get(reverse('category-list'))
+
+        Ingredient.objects.create(recipe=self.recipe, name='Oats', amount='1', unit='cup')
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['ingredients']), 3)
+
+        self.breakfast.name = 'Morning'
+        self.breakfast.save()
+        self.assertEqual(response.json()['categories'][0]['name'], 'Breakfast')
+        self.assertEqual(self.client.get(detail).json()['categories'][0]['name'], 'Morning')
+        self.assertEqual(self.client.get(reverse('category-list')).json()[0]['name'], 'Morning')
+
+    def test_authenticated_recipe_reads_bypass_cache(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('recipe-detail', args=[self.recipe.id])
+        self.client.get(url)
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+
+class RatingAggregateTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = make_recipe('Pancakes')
+        self.other = make_recipe('Waffles')
+        self.second_user = User.objects.create_user('eater@example.com', 'Eat', 'Er', 'Secret123')
+
+    def aggregates(self, recipe):
+        recipe.refresh_from_db()
+        return recipe.rating_count, recipe.rating_sum, recipe.avg_rating
+
+    def test_create_update_move_and_delete_keep_aggregates(self):
+        first = RecipeRating.objects.create(recipe=self.recipe, user=self.user, rating=5)
+        RecipeRating.objects.create(recipe=self.recipe, user=self.second_user, rating=2)
+        self.assertEqual(self.aggregates(self.recipe), (2, 7, 3.5))
+
+        first.rating = 3
+        first.save()
+        self.assertEqual(self.aggregates(self.recipe), (2, 5, 2.5))
+
+        first.recipe = self.other
+        first.save()
+        self.assertEqual(self.aggregates(self.recipe), (1, 2, 2.0))
+        self.assertEqual(self.aggregates(self.other), (1, 3, 3.0))
+
+        first.delete()
+        self.assertEqual(self.aggregates(self.other), (0, 0, 0.0))
+
+    def test_recipe_save_does_not_overwrite_aggregates(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        RecipeRating.objects.create(recipe=self.recipe, user=self.user, rating=4)
+        stale.name = 'Pancakes deluxe'
+        stale.save()
+        self.assertEqual(self.aggregates(self.recipe), (1, 4, 4.0))
+
+    def test_rate_endpoint_upserts_and_orders(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('recipe-rate', args=[self.recipe.id])
+        self.assertEqual(self.client.post(url, {'rating': 6}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'rating': 2}).status_code, 201)
+        self.assertEqual(self.client.post(url, {'rating': 4}).status_code, 200)
+        self.client.post(reverse('recipe-rate', args=[self.other.id]), {'rating': 5})
+        self.assertEqual(self.aggregates(self.recipe), (1, 4, 4.0))
+
+        self.client.force_authenticate(None)
+        results = self.client.get(reverse('recipe-list'), {'ordering': '-avg_rating'}).json()['results']
+        self.assertEqual([r['name'] for r in results], ['Waffles', 'Pancakes'])
+        self.assertEqual(results[1]['rating_count'], 1)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assertEqual(self.aggregates(self.recipe), (0, 0, 0.0))
+
+    def test_concurrent_first_ratings_count_once(self):
+        self.client.force_authenticate(self.user)
+        # Another request inserted this user's first rating after our lookup found none
+        RecipeRating.objects.create(recipe=self.recipe, user=self.user, rating=2)
+        locked_rating, lookups = RecipeViewSet.locked_rating, []
+
+        def lost_race(recipe, user):
+            lookups.append(recipe)
+            return None if len(lookups) == 1 else locked_rating(recipe, user)
+
+        with mock.patch.object(RecipeViewSet, 'locked_rating', side_effect=lost_race):
+            response = self.client.post(reverse('recipe-rate', args=[self.recipe.id]), {'rating': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.aggregates(self.recipe), (1, 4, 4.0))
+
+    def test_rebuild_command_repairs_drift(self):
+        RecipeRating.objects.create(recipe=self.recipe, user=self.user, rating=4)
+        Recipe.objects.filter(pk=self.recipe.pk).update(rating_count=9, rating_sum=1, avg_rating=0.1)
+        untouched = Recipe.objects.get(pk=self.other.pk).updated_at
+        out = io.StringIO()
+        call_command('rebuild_rating_aggregates', verbosity=0, stdout=out)
+        self.assertEqual(out.getvalue(), '')
+        self.assertEqual(self.aggregates(self.recipe), (1, 4, 4.0))
+        self.assertEqual(self.aggregates(self.other), (0, 0, 0.0))
+        # Recipes whose aggregates were right aren't reported to /api/sync/ again
+        self.assertEqual(Recipe.objects.get(pk=self.other.pk).updated_at, untouched)
+        self.assertEqual(ratings.rebuild(), [])
+
+
+# --- Query plans: hot endpoints must be answered from indexes ---
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite syntax')
+class QueryPlanTests(APITestBase):
+    # small lookup tables may be scanned
+    SCANNABLE = {'recipes_category', 'recipes_mealtype'}
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = make_recipe('Porridge', categories=[self.breakfast])
+        make_recipe('Stew', categories=[self.dinner])
+        MealPlan.objects.create(user=self.user, recipe=self.recipe, scheduled_time=timezone.now())
+        self.client.force_authenticate(self.user)
+
+    def full_scans(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 300)
+        scans = []
+        for query in ctx.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                for detail in (row[-1] for row in cursor.fetchall()):
+                    words = detail.split()
+                    # "SCAN <table>" without "USING ... INDEX" reads every row
+                    if (words[:1] == ['SCAN'] and 'INDEX' not in words
+                            and words[1] not in self.SCANNABLE and 'VIRTUAL' not in words):
+                        scans.append(f'{detail}  <-  {query["sql"][:120]}')
+        return scans
+
+    def test_hot_endpoints_use_indexes(self):
+        today = timezone.localdate()
+        cases = [
+            ('get', reverse('recipe-list'), {'healthy': 'false'}),
+            ('get', reverse('recipe-list'), {'healthy': 'true'}),
+            ('get', reverse('recipe-list'), {'ordering': 'prep_time'}),
+            ('get', reverse('recipe-list'), {'ordering': '-cook_time'}),
+            ('get', reverse('recipe-list'), {'ordering': 'servings'}),
+            ('get', reverse('recipe-list'), {'ordering': '-avg_rating'}),
+            ('get', reverse('recipe-list'), {'search': 'porridge'}),
+            ('get', reverse('recipe-detail', args=[self.recipe.id]), None),
+            ('get', reverse('mealplan-list'), None),
+            ('get', reverse('shoppinglist-list'), None),
+            ('post', reverse('shoppinglist-from-meal-plan'), {
+                'start_date': str(today - timedelta(days=1)), 'end_date': str(today + timedelta(days=1)),
+            }),
+            ('post', reverse('recipe-rate', args=[self.recipe.id]), {'rating': 4}),
+        ]
+        for method, url, data in cases:
+            with self.subTest(url=url, data=data):
+                self.assertEqual(self.full_scans(method, url, data), [])
+
+    def test_shopping_list_pages_are_read_in_index_order(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('shoppinglist-list'))
+        [query] = [q['sql'] for q in ctx.captured_queries if 'recipes_shoppinglistitem' in q['sql']]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + query)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('shopping_user_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_detects_full_scans(self):
+        # The unfiltered newest-first list walks the primary key until LIMIT; EXPLAIN
+        # reports that as a SCAN, which is why it is not one of the cases above
+        self.assertTrue(self.full_scans('get', reverse('recipe-list')))
+
+    def test_one_rating_per_user(self):
+        RecipeRating.objects.create(recipe=self.recipe, user=self.user, rating=4)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RecipeRating.objects.create(recipe=self.recipe, user=self.user, rating=2)
+
+
+def photo(width=2000, height=1000, orientation=None, name='photo.jpg'):
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    if orientation:
+        exif[images.ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class ImageVariantTests(MediaRootMixin, APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = make_recipe('Soup')
+
+    def test_saving_queues_rendering_after_commit(self):
+        self.recipe.image = photo()
+        with self.settings(IMAGE_VARIANT_WORKERS=1), mock.patch.object(images, '_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.save()
+            executor.return_value.submit.assert_called_once_with(images.run, self.recipe.pk)
+            # Saving again without a new image queues nothing
+            with self.captureOnCommitCallbacks(execute=True):
+                Recipe.objects.get(pk=self.recipe.pk).save()
+                self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_variants_are_upright_webp_without_exif(self):
+        self.recipe.image = photo(orientation=6)
+        self.recipe.save()
+        uploaded = self.recipe.image.name
+        detail = reverse('recipe-detail', args=[self.recipe.pk])
+        self.assertIsNone(self.client.get(detail).json()['image_variants'])
+
+        variants = images.generate(self.recipe.pk)
+        # The upload with its EXIF is gone
+        self.assertNotEqual(variants['source'], uploaded)
+        self.assertFalse(default_storage.exists(uploaded))
+        sizes = {}
+        for size in images.SIZES:
+            with default_storage.open(variants[size]['name']) as f, Image.open(f) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertFalse(image.getexif())
+                sizes[size] = image.size
+        # Rotated 90 degrees by its EXIF orientation; never upscaled
+        self.assertEqual(sizes, {'thumb': (160, 320), 'card': (480, 960), 'full': (1000, 2000)})
+        with default_storage.open(variants['source']) as f, Image.open(f) as original:
+            self.assertEqual((original.format, original.size), ('JPEG', (1000, 2000)))
+            self.assertFalse(original.getexif())
+
+        data = self.client.get(detail).json()['image_variants']
+        self.assertTrue(data['thumb'].startswith('http://testserver/media/recipes/'))
+        self.assertTrue(data['thumb'].endswith('.webp'))
+        self.assertEqual(data['srcset'], f"{data['thumb']} 160w, {data['card']} 480w, {data['full']} 1000w")
+        listed = self.client.get(reverse('recipe-list'), {'fields': 'image_variants'}).json()['results'][0]
+        self.assertEqual(listed, {'image_variants': data})
+
+    def test_shared_upload_is_kept_while_referenced(self):
+        self.recipe.image = photo()
+        self.recipe.save()
+        other = make_recipe('Stew')
+        other.image = self.recipe.image.name
+        other.save()
+        images.generate(self.recipe.pk)
+        self.assertTrue(default_storage.exists(other.image.name))
+        images.generate(other.pk)
+        self.assertFalse(default_storage.exists(other.image.name))
+
+    def test_replaced_image_is_not_served_stale_variants(self):
+        self.recipe.image = photo(width=1000)
+        self.recipe.save()
+        old = images.generate(self.recipe.pk)
+        self.assertEqual(list(images.pending()), [])
+
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.image = photo(width=1200)
+        recipe.save()
+        self.assertEqual(list(images.pending()), [recipe])
+        self.assertIsNone(self.client.get(reverse('recipe-detail', args=[recipe.pk])).json()['image_variants'])
+
+        new = images.generate(recipe.pk)
+        self.assertEqual(new['source'], Recipe.objects.get(pk=recipe.pk).image.name)
+        self.assertNotEqual(new['card']['name'], old['card']['name'])
+        self.assertEqual(images.generate(recipe.pk), new)
+
+    @override_settings(STORAGES={
+        **settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    })
+    def test_plain_storage_keeps_variants_next_to_the_original(self):
+        self.recipe.image = photo(name='soup.jpg')
+        self.recipe.save()
+        old = images.generate(self.recipe.pk)
+        self.assertEqual(old['thumb']['name'], 'recipes/soup.thumb.webp')
+
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.image = photo(name='stew.jpg')
+        recipe.save()
+        new = images.generate(recipe.pk)
+        self.assertEqual(new['thumb']['name'], 'recipes/stew.thumb.webp')
+        self.assertFalse(default_storage.exists(old['thumb']['name']))
+
+
+class GenerateImageVariantsCommandTests(MediaRootMixin, TransactionTestCase):
+    def test_renders_pending_images_in_a_pool(self):
+        for i in range(3):
+            recipe = make_recipe(f'Dish {i}')
+            recipe.image = photo(width=300, height=200, name=f'dish{i}.jpg')
+            recipe.save()
+        make_recipe('No photo')
+
+        call_command('generate_image_variants', workers=2, stdout=io.StringIO())
+        self.assertEqual(images.pending().count(), 0)
+        self.assertEqual(
+            sorted(r.image_variants['thumb']['width'] for r in Recipe.objects.exclude(image_variants={})),
+            [160, 160, 160],
+        )
+
+
+class BulkImportExportTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = f'{directory}/recipes.jsonl'
+        self.checkpoint = f'{directory}/checkpoint.json'
+
+    def export(self, **options):
+        call_command('export_recipes', output=self.path, verbosity=0, **options)
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+    def test_round_trip(self):
+        make_recipe('Omelette', categories=[self.breakfast], ingredients=('Egg', 'milk'))
+        make_recipe('Stew', categories=[self.dinner, self.breakfast], ingredients=('beef',), steps=3)
+        make_recipe('Salad', ingredients=('tomato', 'cucumber'))
+        exported = self.export(batch_size=1)
+        self.assertEqual(json.loads(exported[0])['categories'], ['Breakfast'])
+        Recipe.objects.all().delete()
+
+        with self.assertNumQueries(14):  # one batch: the same for any number of recipes in it
+            call_command('import_recipes', self.path, verbosity=0)
+        self.assertEqual(self.export(), exported)
+        self.assertEqual(Category.objects.count(), 2)
+        response = self.client.get(reverse('recipe-list'), {'ingredients': 'egg'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Omelette'])
+
+    def test_new_categories_are_created_once(self):
+        line = {
+            'name': 'Tea', 'description': 'Hot', 'prep_time': 1, 'cook_time': 3, 'servings': 1,
+            'categories': ['Drinks'], 'ingredients': [{'name': 'tea', 'amount': '1'}],
+            'instructions': [{'step_number': 1, 'description': 'Brew'}],
+        }
+        with open(self.path, 'w') as f:
+            f.write(json.dumps(line) + '\n' + json.dumps(line) + '\n')
+        call_command('import_recipes', self.path, verbosity=0)
+        drinks = Category.objects.get(name='Drinks')
+        self.assertEqual(drinks.recipes.count(), 2)
+
+    def test_import_resumes_from_checkpoint(self):
+        for i in range(4):
+            make_recipe(f'Dish {i}')
+        lines = self.export()
+        Recipe.objects.all().delete()
+        broken = lines[:3] + ['{"name": "Broken"}'] + lines[3:]
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(broken) + '\n')
+
+        with self.assertRaisesMessage(CommandError, "'Broken': missing"):
+            call_command('import_recipes', self.path, batch_size=2, checkpoint=self.checkpoint, verbosity=0)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        call_command('import_recipes', self.path, batch_size=2, checkpoint=self.checkpoint, verbosity=0)
+        self.assertEqual(list(Recipe.objects.order_by('id').values_list('name', flat=True)), [
+            'Dish 0', 'Dish 1', 'Dish 2', 'Dish 3',
+        ])
+
+    def test_badly_typed_fields_report_the_resume_offset(self):
+        tea = {
+            'name': 'Tea', 'description': 'Hot', 'prep_time': '1', 'cook_time': 3, 'servings': 1,
+            'ingredients': [{'name': 'tea', 'amount': '1'}], 'instructions': [{'step_number': 1, 'description': 'Brew'}],
+        }
+        good = json.dumps(tea) + '\n'
+        for bad, message in (
+            ({'prep_time': 'abc'}, "prep_time 'abc'"),
+            ({'servings': -1}, 'servings -1'),
+            ({'name': 'x' * 300}, 'at most 255 characters'),
+            ({'instructions': [{'step_number': 'one', 'description': 'Brew'}]}, "step_number 'one'"),
+        ):
+            with self.subTest(message):
+                with open(self.path, 'w') as f:
+                    f.write(good + json.dumps({**tea, **bad}) + '\n')
+                with self.assertRaises(CommandError) as raised:
+                    call_command('import_recipes', self.path, batch_size=1, verbosity=0)
+                self.assertIn(message, str(raised.exception))
+                self.assertIn(f'resume from byte {len(good)}', str(raised.exception))
+        self.assertEqual(list(Recipe.objects.values_list('prep_time', flat=True)), [1] * 4)
+
+    def test_export_resumes_after_last_id(self):
+        for i in range(3):
+            make_recipe(f'Dish {i}')
+        self.export(batch_size=2, checkpoint=self.checkpoint)
+        make_recipe('Dish 3')
+        lines = self.export(checkpoint=self.checkpoint)
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['Dish 0', 'Dish 1', 'Dish 2', 'Dish 3'])
+
+
+class SyncTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user('other@example.com', 'Other', 'Cook', 'Secret123')
+        self.omelette = make_recipe('Omelette')
+        self.stew = make_recipe('Stew', ingredients=('beef',))
+        self.salad = make_recipe('Salad', ingredients=('tomato',))
+        self.plan = MealPlan.objects.create(user=self.user, recipe=self.stew, scheduled_time=timezone.now())
+        self.salad_plan = MealPlan.objects.create(user=self.user, recipe=self.salad, scheduled_time=timezone.now())
+        self.flour = ShoppingListItem.objects.create(user=self.user, name='Flour', amount='100', unit='g')
+        self.milk = ShoppingListItem.objects.create(user=self.user, name='Milk', amount='1', unit='pcs')
+        self.theirs = ShoppingListItem.objects.create(user=self.other, name='Salt', amount='1', unit='tsp')
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(reverse('sync'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def age_everything(self):
+        """Move every row an hour back; returns a token from half an hour ago."""
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Recipe, MealPlan, ShoppingListItem):
+            model.objects.update(updated_at=hour_ago)
+        Deletion.objects.update(deleted_at=hour_ago)
+        return sync.token_since(hour_ago + timedelta(minutes=30))
+
+    def test_first_sync_returns_everything(self):
+        data = self.sync()
+        self.assertTrue(data['reset'])
+        self.assertEqual([r['name'] for r in data['recipes']], ['Omelette', 'Stew', 'Salad'])
+        self.assertEqual(len(data['meal_plans']), 2)
+        self.assertEqual([i['name'] for i in data['shopping_list']], ['Flour', 'Milk'])
+        self.assertFalse(data['has_more'])
+        self.assertTrue(sync.parse_token(data['token']))
+
+    def test_only_changes_since_the_token(self):
+        token = self.age_everything()
+        self.assertEqual(self.sync(token), {
+            'token': mock.ANY, 'has_more': False, 'reset': False,
+            'recipes': [], 'meal_plans': [], 'shopping_list': [],
+            'deleted': {'recipes': [], 'meal_plans': [], 'shopping_list': []},
+        })
+
+        Ingredient.objects.filter(recipe=self.omelette, name='egg').delete()
+        self.stew.categories.add(self.dinner)
+        salad_id, salad_plan_id, flour_id = self.salad.id, self.salad_plan.id, self.flour.id
+        self.salad.delete()  # and its meal plan with it
+        shopping.add_recipes(self.user, [(self.omelette.id, 1)])  # merged into Milk by bulk_update
+        self.flour.delete()
+        self.theirs.delete()
+
+        data = self.sync(token)
+        self.assertEqual([r['name'] for r in data['recipes']], ['Omelette', 'Stew'])
+        self.assertEqual(data['recipes'][1]['categories'], [{'id': self.dinner.id, 'name': 'Dinner'}])
+        self.assertEqual(data['meal_plans'], [])
+        self.assertEqual([(i['name'], i['amount']) for i in data['shopping_list']], [('Milk', '2')])
+        self.assertEqual(data['deleted'], {
+            'recipes': [salad_id], 'meal_plans': [salad_plan_id], 'shopping_list': [flour_id],
+        })
+
+    def test_pages(self):
+        token, pages = None, []
+        while True:
+            data = self.sync(token, limit=2)
+            pages.append(data)
+            token = data['token']
+            if not data['has_more']:
+                break
+        self.assertEqual([p['reset'] for p in pages], [True, False])
+        self.assertEqual([r['name'] for p in pages for r in p['recipes']], ['Omelette', 'Stew', 'Salad'])
+        self.assertEqual(sum(len(p['meal_plans']) for p in pages), 2)
+        self.assertEqual([i['name'] for p in pages for i in p['shopping_list']], ['Flour', 'Milk'])
+
+        # A row changed while paging belongs to the next cycle
+        token = self.age_everything()
+        self.omelette.save()
+        self.salad.save()
+        first = self.sync(token, limit=1)
+        self.stew.save()
+        rest = self.sync(first['token'], limit=1)
+        self.assertEqual([r['name'] for r in first['recipes'] + rest['recipes']], ['Omelette', 'Salad'])
+        self.assertFalse(rest['has_more'])
+        self.assertIn('Stew', [r['name'] for r in self.sync(rest['token'])['recipes']])
+
+    def test_late_commit_is_touched_again(self):
+        token = self.age_everything()
+        late = timezone.now() + timedelta(seconds=settings.SYNC_MAX_COMMIT_LAG + 1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.flour.save()
+        ShoppingListItem.objects.filter(pk=self.flour.pk).update(updated_at=timezone.now() - timedelta(minutes=45))
+        with mock.patch('django.utils.timezone.now', return_value=late):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(ShoppingListItem.objects.get(pk=self.flour.pk).updated_at, late)
+        # Past the end of the current cycle: the next one picks it up
+        self.assertEqual(self.sync(token)['shopping_list'], [])
+
+    def test_instruction_and_rating_changes_touch_the_recipe(self):
+        token = self.age_everything()
+        Instruction.objects.filter(recipe=self.omelette).update(description='Whisk')
+        self.assertEqual(self.sync(token)['recipes'], [])
+        self.omelette.instructions.first().save()
+        RecipeRating.objects.create(recipe=self.stew, user=self.user, rating=5)
+        self.assertEqual([r['name'] for r in self.sync(token)['recipes']], ['Omelette', 'Stew'])
+
+    def test_old_or_invalid_token(self):
+        token = sync.token_since(timezone.now() - timedelta(days=settings.SYNC_DELETION_RETENTION_DAYS + 1))
+        data = self.sync(token)
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['recipes']), 3)
+        response = self.client.get(reverse('sync'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_purge_deletions(self):
+        self.milk.delete()
+        self.salad.delete()
+        Deletion.objects.filter(kind=Deletion.RECIPE).update(
+            deleted_at=timezone.now() - timedelta(days=settings.SYNC_DELETION_RETENTION_DAYS + 1)
+        )
+        call_command('purge_deletions', batch_size=1, verbosity=0)
+        self.assertEqual(
+            sorted(Deletion.objects.values_list('kind', flat=True)),
+            [Deletion.MEAL_PLAN, Deletion.SHOPPING_LIST_ITEM],
+        )
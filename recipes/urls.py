@@ -1,7 +1,7 @@
 from rest_framework.routers import DefaultRouter
 from .views import (
     RecipeViewSet, MealPlanViewSet, ShoppingListItemViewSet,
-    IngredientListView, CategoryViewSet, MealTypeViewSet,
+    IngredientListView, CategoryViewSet, MealTypeViewSet, SyncView,
 )
 
 router = DefaultRouter()
@@ -17,4 +17,5 @@ urlpatterns = router.urls
 from django.urls import path
 urlpatterns += [
     path('ingredients/', IngredientListView.as_view(), name='ingredient-list'),
+    path('sync/', SyncView.as_view(), name='sync'),
 ]
@@ -1,50 +1,156 @@
-from rest_framework import viewsets, permissions, status, filters, generics
+from rest_framework import viewsets, permissions, status, filters, generics, renderers
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Min
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend # type: ignore
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .models import (
-    Recipe, Ingredient, MealPlan, ShoppingListItem, Category, MealType
+    Recipe, RecipeRating, Ingredient, MealPlan, ShoppingListItem, Category, MealType
 )
+from . import autocomplete, listing, pantry, shopping, sync
+from .caching import CachedResponseMixin
+from .pagination import IdCursorPagination, MealPlanCursorPagination, RecipeCursorPagination
+from .search import RecipeSearchFilter
 from .serializers import (
-    RecipeSerializer, IngredientSerializer, IngredientNameSerializer,
-    MealPlanSerializer, ShoppingListItemSerializer, CategorySerializer, MealTypeSerializer
+    RecipeSerializer, CookableRecipeSerializer, IngredientSerializer, IngredientNameSerializer,
+    MealPlanSerializer, ShoppingListItemSerializer, CategorySerializer, MealTypeSerializer,
+    RecipeRatingSerializer
 )
 
+COOKABLE_LIMIT = 20
+COOKABLE_MAX_LIMIT = 100
+EXPORT_CHUNK_SIZE = 500
+
+
+async def _async_chunks(chunks):
+    # Under ASGI Django would read a sync iterator to the end before sending anything
+    while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+        yield chunk
+
+# --- Shopping list: add recipe ingredients (shared by both add-recipe actions) ---
+ADD_RECIPE_BODY = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'recipe_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+        'recipe_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+        'servings_multiplier': openapi.Schema(
+            type=openapi.TYPE_NUMBER,
+            description="Scale every amount, e.g. 2 for a double batch (default 1, at most 100)"
+        ),
+    }
+)
+ADD_RECIPE_RESPONSE = openapi.Response('Ingredients added', schema=openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'status': openapi.Schema(type=openapi.TYPE_STRING),
+        'created': openapi.Schema(type=openapi.TYPE_INTEGER),
+        'updated': openapi.Schema(type=openapi.TYPE_INTEGER),
+    }
+))
+
+
+def add_recipes_to_shopping_list(request):
+    if hasattr(request.data, 'getlist'):
+        recipe_ids = request.data.getlist('recipe_ids')
+    else:
+        recipe_ids = request.data.get('recipe_ids') or []
+    if isinstance(recipe_ids, str):
+        recipe_ids = recipe_ids.split(',')
+    if request.data.get('recipe_id'):
+        recipe_ids = [request.data.get('recipe_id'), *recipe_ids]
+    if not recipe_ids:
+        return Response({'error': 'recipe_id or recipe_ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        recipe_ids = {int(i) for i in recipe_ids}
+        multiplier = Decimal(str(request.data.get('servings_multiplier', 1)))
+        if not multiplier.is_finite() or not 0 < multiplier <= shopping.MAX_MULTIPLIER:
+            raise ValueError
+    except (TypeError, ValueError, InvalidOperation):
+        return Response({'error': 'recipe_ids must be integers and servings_multiplier a positive number '
+                                  f'up to {shopping.MAX_MULTIPLIER}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if Recipe.objects.filter(id__in=recipe_ids).count() != len(recipe_ids):
+        return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
+    counts = shopping.add_recipes(request.user, [(recipe_id, multiplier) for recipe_id in recipe_ids])
+    return Response({'status': 'Ingredients added to shopping list', **counts})
+
 # --- Category CRUD ---
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_group = 'categories'
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    throttle_scope = 'recipes'
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
 # --- MealType CRUD ---
-class MealTypeViewSet(viewsets.ModelViewSet):
+class MealTypeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = MealType.objects.all()
     serializer_class = MealTypeSerializer
+    cache_group = 'mealtypes'
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    throttle_scope = 'recipes'
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
 # --- Recipe CRUD + Search by Multiple Ingredients ---
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
-    CRUD for recipes, including search by name, categories, and ingredients.
-    To search recipes by multiple ingredients:  
+    CRUD for recipes, including full-text search by name, categories, and ingredients.
+    To search recipes by multiple ingredients:
     Example: `/api/recipes/?ingredients=egg,milk,flour`
     """
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.with_details()
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
-    search_fields = ['name', 'categories__name', 'ingredients__name']
-    ordering_fields = ['prep_time', 'cook_time', 'servings']
+    throttle_scope = 'recipes'
+    filter_backends = [RecipeSearchFilter, filters.OrderingFilter, DjangoFilterBackend]
+    pagination_class = RecipeCursorPagination
+    # Same bytes as DRF's JSONRenderer, encoded with orjson (see recipes.listing)
+    renderer_classes = [listing.FastJSONRenderer, renderers.BrowsableAPIRenderer]
+    cache_group = 'recipes'
+    cache_anonymous_only = True
+    ordering_fields = ['prep_time', 'cook_time', 'servings', 'avg_rating', 'rating_count']
     filterset_fields = ['categories', 'healthy']
 
+    def get_queryset(self):
+        request = getattr(self, 'request', None)
+        wanted = None
+        if request is not None and request.method == 'DELETE':
+            # The collector loads the children itself
+            return Recipe.objects.all()
+        if request is not None and request.method == 'GET':
+            wanted = RecipeSerializer.requested_fields(request.query_params)
+        if wanted is None:
+            return super().get_queryset()
+        # Only prefetch the children the response will contain
+        relations = [r for r in ('categories', 'ingredients', 'instructions') if r in wanted]
+        return Recipe.objects.all().with_details(*relations) if relations else Recipe.objects.all()
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.rows_touched = serializer.rows_touched
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        # Child rows actually written by the diff-based sync (see RecipeSerializer.update)
+        response['X-Rows-Touched'] = sum(
+            sum(counts.values()) for counts in self.rows_touched.values()
+        )
+        return response
+
     @swagger_auto_schema(
         operation_description="Search recipes by one or more ingredients. "
                               "For example: ?ingredients=egg,milk,flour (all must be in the recipe)",
@@ -57,85 +163,186 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ]
     )
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        ingredients_param = request.query_params.get('ingredients')
-        if ingredients_param:
-            ingredient_names = [i.strip() for i in ingredients_param.split(',') if i.strip()]
-            for name in ingredient_names:
-                queryset = queryset.filter(ingredients__name__icontains=name)
-            queryset = queryset.distinct()
+        # ?search= and ?ingredients= are both answered from the full-text index
+        # by RecipeSearchFilter, best matches first. Rows are rendered by the
+        # read-only fast path in recipes.listing, same output as RecipeSerializer.
+        return self.cached_response(request, None, self.render_list, *args, **kwargs)
+
+    def render_list(self, request, *args, **kwargs):
+        wanted = RecipeSerializer.requested_fields(request.query_params)
+        queryset = listing.row_queryset(self.filter_queryset(self.get_queryset()), wanted)
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+            return self.get_paginated_response(listing.build(page, wanted, request))
+        return Response(listing.build(queryset, wanted, request))
 
     @swagger_auto_schema(
-        operation_description="Add all ingredients from a recipe to the current user's shopping list",
-        responses={200: openapi.Response('Ingredients added', schema=openapi.Schema(
-            type=openapi.TYPE_OBJECT,
-            properties={'status': openapi.Schema(type=openapi.TYPE_STRING)}
-        ))},
-        request_body=openapi.Schema(
-            type=openapi.TYPE_OBJECT,
-            required=['recipe_id'],
-            properties={'recipe_id': openapi.Schema(type=openapi.TYPE_INTEGER)}
+        operation_description="Recipes ranked by how well they are covered by the given pantry: "
+                              "fully makeable first, then by fewest missing ingredients. "
+                              "Ingredient ids come from /api/ingredients/ (the `catalog_id` of recipe ingredients).",
+        manual_parameters=[
+            openapi.Parameter(
+                'ingredient_ids', openapi.IN_QUERY,
+                description="Comma-separated catalog ingredient ids, e.g. 3,7,12",
+                type=openapi.TYPE_STRING, required=True
+            ),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                description=f"Maximum number of recipes (default {COOKABLE_LIMIT}, max {COOKABLE_MAX_LIMIT})",
+                type=openapi.TYPE_INTEGER
+            ),
+        ],
+        responses={200: CookableRecipeSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], url_path='cookable')
+    def cookable(self, request):
+        try:
+            ingredient_ids = {int(i) for i in request.query_params.get('ingredient_ids', '').split(',') if i.strip()}
+            limit = min(int(request.query_params.get('limit', COOKABLE_LIMIT)), COOKABLE_MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'ingredient_ids must be comma-separated integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not ingredient_ids:
+            return Response({'error': 'ingredient_ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+        ranked = pantry.get_index().rank(ingredient_ids, max(limit, 1))
+        coverage = {recipe_id: (matched, missing) for recipe_id, matched, missing in ranked}
+        recipes = Recipe.objects.with_details().in_bulk(coverage)
+        serializer = CookableRecipeSerializer(
+            [recipes[recipe_id] for recipe_id, _, _ in ranked if recipe_id in recipes],
+            many=True,
+            context={**self.get_serializer_context(), 'coverage': coverage}
         )
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Every recipe as NDJSON (one JSON object per line, same fields as the list), "
+                              "streamed in order of `updated_at` so memory use stays flat on both ends. "
+                              "For incremental syncs pass the last `updated_at` received as ?updated_since=. "
+                              "Accepts ?fields= and ?expand= like the list.",
+        manual_parameters=[
+            openapi.Parameter(
+                'updated_since', openapi.IN_QUERY,
+                description="ISO 8601 datetime, e.g. 2026-01-31T12:00:00Z; only recipes changed at or after it",
+                type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+            ),
+        ],
+        responses={200: openapi.Response('application/x-ndjson stream of recipes')}
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        queryset = Recipe.objects.order_by('updated_at', 'id')
+        if request.query_params.get('updated_since'):
+            try:
+                updated_since = parse_datetime(request.query_params['updated_since'])
+            except ValueError:
+                updated_since = None
+            if updated_since is None:
+                return Response({'error': 'updated_since must be an ISO 8601 datetime'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+            queryset = queryset.filter(updated_at__gte=updated_since)
+
+        wanted = RecipeSerializer.requested_fields(request.query_params)
+        if wanted is not None:
+            # What a client needs to resume from
+            wanted |= {'id', 'updated_at'}
+        chunks = listing.stream(queryset, wanted, request, EXPORT_CHUNK_SIZE)
+        if isinstance(request._request, ASGIRequest):
+            chunks = _async_chunks(chunks)
+        return StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Rate a recipe (1-5) or change your rating of it",
+        request_body=RecipeRatingSerializer,
+        responses={200: RecipeRatingSerializer, 201: RecipeRatingSerializer}
+    )
+    @swagger_auto_schema(method='delete', operation_description="Remove your rating of a recipe",
+                         responses={204: 'Rating removed'})
+    @action(detail=True, methods=['post', 'delete'], url_path='rate',
+            permission_classes=[permissions.IsAuthenticated])
+    def rate(self, request, pk=None):
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        with transaction.atomic():
+            existing = self.locked_rating(recipe, request.user)
+            if request.method == 'DELETE':
+                if existing is None:
+                    return Response({'error': 'You have not rated this recipe'}, status=status.HTTP_404_NOT_FOUND)
+                existing.delete()
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            if existing is None:
+                serializer = RecipeRatingSerializer(data=request.data)
+                serializer.is_valid(raise_exception=True)
+                try:
+                    with transaction.atomic():
+                        serializer.save(recipe=recipe, user=request.user)
+                    return Response(serializer.data, status=status.HTTP_201_CREATED)
+                except IntegrityError:
+                    # There was no row to lock, and a concurrent first rating by the same
+                    # user won the unique constraint: update that one instead
+                    existing = self.locked_rating(recipe, request.user)
+                    if existing is None:
+                        raise
+            serializer = RecipeRatingSerializer(existing, data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(recipe=recipe, user=request.user)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def locked_rating(recipe, user):
+        return RecipeRating.objects.select_for_update().filter(recipe=recipe, user=user).first()
+
+    @swagger_auto_schema(
+        operation_description="Add all ingredients from one or more recipes to the current user's shopping list",
+        responses={200: ADD_RECIPE_RESPONSE},
+        request_body=ADD_RECIPE_BODY
     )
     @action(detail=False, methods=['post'], url_path='add-recipe')
     def add_recipe_ingredients(self, request):
-        recipe_id = request.data.get('recipe_id')
-        if not recipe_id:
-            return Response({'error': 'recipe_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-        try:
-            recipe = Recipe.objects.get(id=recipe_id)
-        except Recipe.DoesNotExist:
-            return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
-        for ing in recipe.ingredients.all():
-            item, created = ShoppingListItem.objects.get_or_create(
-                user=request.user,
-                name=ing.name,
-                unit=ing.unit,
-                defaults={'amount': ing.amount, 'checked': False}
-            )
-            if not created:
-                item.amount = f"{item.amount} + {ing.amount}"
-                item.save()
-        return Response({'status': 'Ingredients added to shopping list'})
+        return add_recipes_to_shopping_list(request)
 
-# --- Ingredient autocomplete/search (unique names only) ---
+# --- Ingredient autocomplete/search (unique catalog names, served from memory) ---
 class IngredientListView(generics.ListAPIView):
     serializer_class = IngredientNameSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'recipes'
+    filter_backends = []
 
     @swagger_auto_schema(
-        operation_description="Autocomplete/search ingredients by name (unique). ?search=onion",
+        operation_description="Autocomplete ingredients by name prefix, most used first. ?search=onion. "
+                              "Returned ids are catalog ids, usable with /api/recipes/cookable/.",
         manual_parameters=[
-            openapi.Parameter('search', openapi.IN_QUERY, description="Ingredient name", type=openapi.TYPE_STRING)
+            openapi.Parameter('search', openapi.IN_QUERY, description="Ingredient name prefix", type=openapi.TYPE_STRING),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                description=f"Maximum number of results (default {autocomplete.DEFAULT_LIMIT}, max {autocomplete.MAX_LIMIT})",
+                type=openapi.TYPE_INTEGER
+            ),
         ]
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        search = self.request.query_params.get('search')
-        qs = Ingredient.objects.all()
-        if search:
-            qs = qs.filter(name__icontains=search)
-        qs = qs.values('name').annotate(id=Min('id'))
-        ids = [item['id'] for item in qs]
-        return Ingredient.objects.filter(id__in=ids)
+        try:
+            limit = int(self.request.query_params.get('limit', autocomplete.DEFAULT_LIMIT))
+        except ValueError:
+            limit = autocomplete.DEFAULT_LIMIT
+        limit = max(1, min(limit, autocomplete.MAX_LIMIT))
+        matches = autocomplete.lookup(self.request.query_params.get('search'), limit)
+        return [{'id': pk, 'name': name, 'recipe_count': uses} for pk, name, uses in matches]
 
 # --- MealPlan CRUD (user-scoped) ---
 class MealPlanViewSet(viewsets.ModelViewSet):
     serializer_class = MealPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MealPlanCursorPagination
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return MealPlan.objects.none()
-        return MealPlan.objects.filter(user=self.request.user)
+        return MealPlan.objects.filter(user=self.request.user).with_details()
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -144,6 +351,7 @@ class MealPlanViewSet(viewsets.ModelViewSet):
 class ShoppingListItemViewSet(viewsets.ModelViewSet):
     serializer_class = ShoppingListItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = IdCursorPagination
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
@@ -154,31 +362,101 @@ class ShoppingListItemViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
     @swagger_auto_schema(
-        operation_description="Add all ingredients from a recipe to user's shopping list (by recipe_id)",
+        operation_description="Add all ingredients from one or more recipes to user's shopping list "
+                              "(by recipe_id or recipe_ids), merging amounts of matching items",
+        request_body=ADD_RECIPE_BODY,
+        responses={200: ADD_RECIPE_RESPONSE}
+    )
+    @action(detail=False, methods=['post'], url_path='add-recipe')
+    def add_recipe_ingredients(self, request):
+        return add_recipes_to_shopping_list(request)
+
+    @swagger_auto_schema(
+        operation_description="Add the ingredients of every planned meal between start_date and end_date "
+                              "(inclusive) to the shopping list, scaled to each plan's servings",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
-            required=['recipe_id'],
-            properties={'recipe_id': openapi.Schema(type=openapi.TYPE_INTEGER)}
+            required=['start_date', 'end_date'],
+            properties={
+                'start_date': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                'end_date': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            }
         ),
-        responses={200: 'Ingredients added'}
+        responses={200: ADD_RECIPE_RESPONSE}
     )
-    @action(detail=False, methods=['post'], url_path='add-recipe')
-    def add_recipe_ingredients(self, request):
-        recipe_id = request.data.get('recipe_id')
-        if not recipe_id:
-            return Response({'error': 'recipe_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    @action(detail=False, methods=['post'], url_path='from-meal-plan')
+    def from_meal_plan(self, request):
         try:
-            recipe = Recipe.objects.get(id=recipe_id)
-        except Recipe.DoesNotExist:
-            return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
-        for ing in recipe.ingredients.all():
-            item, created = ShoppingListItem.objects.get_or_create(
-                user=request.user,
-                name=ing.name,
-                unit=ing.unit,
-                defaults={'amount': ing.amount, 'checked': False}
-            )
-            if not created:
-                item.amount = f"{item.amount} + {ing.amount}"
-                item.save()
-        return Response({'status': 'Ingredients added to shopping list'})
+            start = parse_date(str(request.data.get('start_date', '')))
+            end = parse_date(str(request.data.get('end_date', '')))
+        except ValueError:
+            start = end = None
+        if not start or not end or end < start:
+            return Response({'error': 'start_date and end_date (YYYY-MM-DD, end >= start) are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        tz = timezone.get_current_timezone()
+        recipes = shopping.planned_recipes(
+            request.user,
+            datetime.combine(start, time.min, tzinfo=tz),
+            datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+        )
+        counts = shopping.add_recipes(request.user, recipes)
+        return Response({'status': f'Ingredients from {len(recipes)} planned meals added to shopping list', **counts})
+
+# --- Incremental sync for mobile clients ---
+class SyncView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'recipes'
+    renderer_classes = [listing.FastJSONRenderer, renderers.BrowsableAPIRenderer]
+
+    @swagger_auto_schema(
+        operation_description="Recipes, the user's meal plans and shopping list items changed or deleted since "
+                              "the previous sync, in pages. Send the `token` of the last response as ?since= and "
+                              "repeat while `has_more` is true. Without a token (or with one that is too old) "
+                              "everything is returned and the first page has `reset` set: clear the local copy "
+                              "before applying it. The same row may be returned twice; apply changes by id.",
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, description="Token from the previous response",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                description=f"Maximum rows per collection and page (default {sync.PAGE_SIZE}, max {sync.MAX_PAGE_SIZE})",
+                type=openapi.TYPE_INTEGER
+            ),
+        ],
+        responses={200: openapi.Response('Changes since the token', schema=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'token': openapi.Schema(type=openapi.TYPE_STRING),
+                'has_more': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                'reset': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                'recipes': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                'meal_plans': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                'shopping_list': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                'deleted': openapi.Schema(type=openapi.TYPE_OBJECT, description="Deleted ids per collection"),
+            }
+        ))}
+    )
+    def get(self, request):
+        state = None
+        if request.query_params.get('since'):
+            state = sync.parse_token(request.query_params['since'])
+            if state is None:
+                return Response({'error': 'Invalid sync token'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', sync.PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, sync.MAX_PAGE_SIZE))
+
+        changes = sync.page(request.user, state, limit)
+        context = {'request': request}
+        return Response({
+            'token': changes['token'],
+            'has_more': changes['has_more'],
+            'reset': changes['reset'],
+            'recipes': listing.build(changes['recipes'], None, request),
+            'meal_plans': MealPlanSerializer(changes['meal_plans'], many=True, context=context).data,
+            'shopping_list': ShoppingListItemSerializer(changes['shopping_list'], many=True, context=context).data,
+            'deleted': changes['deleted'],
+        })